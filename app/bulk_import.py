@@ -0,0 +1,249 @@
+"""
+Bulk import of posts and users from NDJSON.
+
+    python -m app.bulk_import posts posts.ndjson
+    python -m app.bulk_import users - < users.ndjson
+
+Input is read line by line and inserted in batches, each in its own transaction:
+with `COPY ... FROM STDIN` on Postgres and executemany elsewhere. Invalid lines and
+failed batches are reported without stopping the import.
+"""
+import argparse
+import asyncio
+import csv
+import io
+import json
+import os
+import sys
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
+
+from app import models, schemas
+from app.cache import response_cache
+from app.database import SessionLocal
+from app.user_stats import change_user_stats
+from app.utils import hash_password
+
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", 1000))
+BULK_HASH_WORKERS = int(os.getenv("BULK_HASH_WORKERS", os.cpu_count() or 1))
+
+
+def prepare_posts(items):
+    return [item.dict() for item in items]
+
+
+def prepare_users(items):
+    """
+    Hash the passwords of a batch of users in parallel.
+
+    bcrypt releases the GIL while hashing, so a thread pool uses all cores.
+    """
+    with ThreadPoolExecutor(max_workers=BULK_HASH_WORKERS) as executor:
+        hashed = list(executor.map(hash_password, [item.password for item in items]))
+    return [{"email": item.email, "password": password} for item, password in zip(items, hashed)]
+
+
+IMPORTERS = {
+    "posts": (schemas.PostImport, models.Post.__table__, ("title", "content", "image", "owner_id"), prepare_posts),
+    "users": (schemas.UserCreate, models.User.__table__, ("email", "password"), prepare_users),
+}
+
+
+class ImportReport:
+    """
+    Running totals and errors of an import.
+    """
+
+    def __init__(self):
+        self.inserted = 0
+        self.failed = 0
+        self.errors = []
+
+    def line_error(self, line_number, error):
+        self.failed += 1
+        self.errors.append({"line": line_number, "error": error})
+
+    def batch_error(self, first_line, last_line, size, error):
+        self.failed += size
+        self.errors.append({"lines": [first_line, last_line], "error": error})
+
+    def dict(self):
+        return {"inserted": self.inserted, "failed": self.failed, "errors": self.errors}
+
+
+def error_summary(error):
+    lines = str(error).strip().splitlines()
+    return lines[0] if lines else repr(error)
+
+
+def copy_rows(db, table, columns, rows):
+    """
+    Insert rows with `COPY ... FROM STDIN` through the session's psycopg2 connection.
+
+    Every field is quoted: COPY reads an unquoted empty field as NULL, which would
+    reject empty strings in NOT NULL columns that executemany accepts.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, quoting=csv.QUOTE_ALL)
+    for row in rows:
+        writer.writerow([row[column] for column in columns])
+    buffer.seek(0)
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
+
+
+def insert_rows(db, table, columns, rows):
+    if db.get_bind().dialect.name == "postgresql":
+        copy_rows(db, table, columns, rows)
+    else:
+        db.execute(table.insert(), rows)
+
+
+def import_batch(kind, lines, report):
+    """
+    Validate and insert one batch of NDJSON lines in a single transaction.
+
+    Args:
+        kind (str): "posts" or "users".
+        lines (List[tuple]): (line number, raw str or UTF-8 bytes line) pairs.
+        report (ImportReport): Report updated with the outcome.
+    """
+    schema, table, columns, prepare = IMPORTERS[kind]
+    items = []
+    line_numbers = []
+    for line_number, line in lines:
+        try:
+            if isinstance(line, bytes):
+                line = line.decode()
+            items.append(schema(**json.loads(line)))
+            line_numbers.append(line_number)
+        except (ValueError, TypeError, ValidationError) as error:
+            report.line_error(line_number, str(error))
+    if not items:
+        return
+
+    db = SessionLocal()
+    try:
+        insert_rows(db, table, columns, prepare(items))
+        if kind == "posts":
+            for owner_id, post_count in Counter(item.owner_id for item in items).items():
+                change_user_stats(db, owner_id, post_count=post_count)
+        db.commit()
+        report.inserted += len(items)
+    except Exception as error:
+        db.rollback()
+        report.batch_error(line_numbers[0], line_numbers[-1], len(items), error_summary(error))
+    finally:
+        db.close()
+
+
+def iter_batches(lines, batch_size):
+    batch = []
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        batch.append((line_number, line))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def import_lines(kind, lines, batch_size=BULK_BATCH_SIZE):
+    """
+    Import an iterable of NDJSON lines.
+
+    Args:
+        kind (str): "posts" or "users".
+        lines: Iterable of str or UTF-8 bytes lines.
+        batch_size (int): Rows per transaction.
+
+    Returns:
+        dict: Inserted and failed row counts and the errors.
+    """
+    report = ImportReport()
+    for batch in iter_batches(lines, batch_size):
+        import_batch(kind, batch, report)
+    if kind == "posts" and report.inserted:
+        response_cache.bump("posts")
+    return report.dict()
+
+
+async def iter_stream_lines(chunks):
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line
+    if buffer:
+        yield buffer
+
+
+async def import_stream(kind, chunks, batch_size=BULK_BATCH_SIZE):
+    """
+    Import NDJSON from a request body stream.
+
+    At most two batches are held in memory: one is inserted in the threadpool while
+    the event loop reads the next one from the body.
+
+    Args:
+        kind (str): "posts" or "users".
+        chunks: Async iterable of body chunks, e.g. `request.stream()`.
+        batch_size (int): Rows per transaction.
+
+    Returns:
+        dict: Inserted and failed row counts and the errors.
+    """
+    report = ImportReport()
+    batch = []
+    line_number = 0
+    inserting = None
+    try:
+        async for line in iter_stream_lines(chunks):
+            line_number += 1
+            if not line.strip():
+                continue
+            batch.append((line_number, line))
+            if len(batch) >= batch_size:
+                if inserting is not None:
+                    await inserting
+                inserting = asyncio.ensure_future(run_in_threadpool(import_batch, kind, batch, report))
+                batch = []
+    finally:
+        if inserting is not None:
+            await inserting
+    if batch:
+        await run_in_threadpool(import_batch, kind, batch, report)
+    if kind == "posts" and report.inserted:
+        response_cache.bump("posts")
+    return report.dict()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import posts or users from NDJSON.")
+    parser.add_argument("kind", choices=sorted(IMPORTERS))
+    parser.add_argument("path", help="NDJSON file, or - for stdin")
+    parser.add_argument("--batch-size", type=int, default=BULK_BATCH_SIZE)
+    args = parser.parse_args()
+
+    if args.path == "-":
+        report = import_lines(args.kind, sys.stdin.buffer, args.batch_size)
+    else:
+        with open(args.path, "rb") as lines:
+            report = import_lines(args.kind, lines, args.batch_size)
+    json.dump(report, sys.stdout, indent=2)
+    print()
+    if report["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
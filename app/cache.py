@@ -0,0 +1,272 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", 30))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", 10000))
+
+
+class TTLCache:
+    """
+    In-process LRU cache whose entries expire after a time-to-live.
+
+    Entries and version counters live in the memory of a single worker, so under
+    `gunicorn -w N` an invalidation only reaches the worker that performed the write;
+    other workers serve their copy until the TTL runs out.
+    """
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Look up a key.
+
+        Returns:
+            tuple: (hit, value) where hit is False for missing or expired keys.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def incr(self, key):
+        with self._lock:
+            _, value = self._entries.get(key, (None, 0))
+            value += 1
+            self._entries[key] = (None, value)
+            self._entries.move_to_end(key)
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisCache:
+    """
+    Cache backend shared between workers, stored in Redis.
+
+    Values are stored as JSON, so only JSON-compatible data can be cached.
+
+    Args:
+        client: Redis client, or any object implementing `get`, `set(ex=...)`,
+            `delete` and `incr` (see FakeRedis).
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    def get(self, key):
+        raw = self.client.get(key)
+        if raw is None:
+            return False, None
+        return True, json.loads(raw)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(key, json.dumps(value), ex=ttl)
+
+    def delete(self, key):
+        self.client.delete(key)
+
+    def incr(self, key):
+        return int(self.client.incr(key))
+
+
+class FakeRedis:
+    """
+    Local stand-in for a Redis client implementing the commands used by the app.
+
+    Useful for running the shared backends without a Redis server. Like Redis, it
+    stores and returns values as bytes.
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._expiry = {}
+        self._lock = threading.Lock()
+
+    def _expire_if_needed(self, key):
+        expires_at = self._expiry.get(key)
+        if expires_at is not None and expires_at <= time.monotonic():
+            self._data.pop(key, None)
+            self._expiry.pop(key, None)
+
+    def get(self, key):
+        with self._lock:
+            self._expire_if_needed(key)
+            return self._data.get(key)
+
+    @staticmethod
+    def _encode(value):
+        if isinstance(value, bytes):
+            return value
+        return str(value).encode()
+
+    def set(self, key, value, ex=None):
+        with self._lock:
+            self._data[key] = self._encode(value)
+            if ex:
+                self._expiry[key] = time.monotonic() + ex
+            else:
+                self._expiry.pop(key, None)
+            return True
+
+    def delete(self, *keys):
+        with self._lock:
+            removed = 0
+            for key in keys:
+                if self._data.pop(key, None) is not None:
+                    removed += 1
+                self._expiry.pop(key, None)
+            return removed
+
+    def incr(self, key, amount=1):
+        with self._lock:
+            self._expire_if_needed(key)
+            value = int(self._data.get(key, b"0")) + amount
+            self._data[key] = self._encode(value)
+            return value
+
+    def expire(self, key, seconds):
+        with self._lock:
+            self._expire_if_needed(key)
+            if key not in self._data:
+                return False
+            self._expiry[key] = time.monotonic() + seconds
+            return True
+
+    def flushall(self):
+        with self._lock:
+            self._data.clear()
+            self._expiry.clear()
+
+
+class ResponseCache:
+    """
+    Read-through cache for endpoint responses with versioned keys.
+
+    Every cached entry belongs to an entity ("post", "posts", "user", "image") and,
+    optionally, an entity id. The key embeds the current version of that entity, so
+    writers invalidate by bumping the version instead of hunting down every key that
+    was derived from it. Concurrent misses on the same key are collapsed: one thread
+    runs the loader while the others wait for its result (single-flight).
+
+    Args:
+        backend: Storage backend (TTLCache or RedisCache).
+        ttl (int): Lifetime of cached entries in seconds; 0 disables caching.
+    """
+
+    def __init__(self, backend, ttl=CACHE_TTL_SECONDS):
+        self.backend = backend
+        self.ttl = ttl
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+
+    @staticmethod
+    def _version_key(entity, entity_id=None):
+        if entity_id is None:
+            return f"ver:{entity}"
+        return f"ver:{entity}:{entity_id}"
+
+    def version(self, entity, entity_id=None):
+        hit, value = self.backend.get(self._version_key(entity, entity_id))
+        return value if hit else 0
+
+    def bump(self, entity, entity_id=None):
+        """
+        Invalidate every cached entry of an entity by moving it to a new version.
+        """
+        return self.backend.incr(self._version_key(entity, entity_id))
+
+    def key(self, entity, entity_id=None, **params):
+        parts = [entity]
+        if entity_id is not None:
+            parts.append(str(entity_id))
+        parts.append(f"v{self.version(entity, entity_id)}")
+        parts.extend(f"{name}={params[name]}" for name in sorted(params))
+        return ":".join(parts)
+
+    def get_or_set(self, entity, entity_id, loader, **params):
+        """
+        Return the cached value for an entity, calling loader on a miss.
+
+        Args:
+            entity (str): Entity name.
+            entity_id: ID of the entity, or None for collections.
+            loader: Callable producing a JSON-compatible value.
+            **params: Request parameters that are part of the key (e.g. search).
+
+        Returns:
+            The cached or freshly loaded value.
+        """
+        if not self.ttl:
+            return loader()
+
+        key = self.key(entity, entity_id, **params)
+        hit, value = self.backend.get(key)
+        if hit:
+            return value
+
+        with self._inflight_lock:
+            lock = self._inflight.setdefault(key, threading.Lock())
+        try:
+            with lock:
+                hit, value = self.backend.get(key)
+                if hit:
+                    return value
+                value = loader()
+                self.backend.set(key, value, self.ttl)
+                return value
+        finally:
+            with self._inflight_lock:
+                if self._inflight.get(key) is lock:
+                    del self._inflight[key]
+
+
+def create_backend(name=CACHE_BACKEND):
+    """
+    Build the cache backend selected by CACHE_BACKEND.
+
+    Args:
+        name (str): "memory", "redis" or "fake-redis".
+
+    Returns:
+        TTLCache or RedisCache.
+    """
+    if name == "memory":
+        return TTLCache()
+    if name == "fake-redis":
+        return RedisCache(FakeRedis())
+    if name == "redis":
+        import redis
+
+        return RedisCache(redis.Redis.from_url(CACHE_REDIS_URL))
+    raise ValueError(f"Unknown cache backend: {name}")
+
+
+response_cache = ResponseCache(create_backend())
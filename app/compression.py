@@ -0,0 +1,156 @@
+import os
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "1") == "1"
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", 1024))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", 4))
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/x-ndjson", "application/javascript",
+                      "application/xml")
+
+
+class GzipCompressor:
+    def __init__(self, level=GZIP_LEVEL):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data, final):
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class BrotliCompressor:
+    def __init__(self, quality=BROTLI_QUALITY):
+        import brotli
+
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data, final):
+        output = self._compressor.process(data)
+        return output + (self._compressor.finish() if final else self._compressor.flush())
+
+
+def brotli_available():
+    try:
+        import brotli  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def negotiate_encoding(accept_encoding, brotli_enabled):
+    """
+    Pick the response encoding from an Accept-Encoding header.
+
+    Args:
+        accept_encoding (str): Header value, e.g. "gzip, deflate, br;q=0.9".
+        brotli_enabled (bool): Whether brotli may be chosen.
+
+    Returns:
+        str: "br", "gzip" or None for an uncompressed response.
+    """
+    accepted = {}
+    for item in accept_encoding.lower().split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip()] = quality
+    candidates = [("br", brotli_enabled), ("gzip", True)]
+    best = max(((accepted.get(coding, accepted.get("*", 0.0)), coding) for coding, enabled in candidates if enabled),
+               key=lambda candidate: candidate[0])
+    return best[1] if best[0] > 0 else None
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing responses with brotli or gzip.
+
+    The encoding is negotiated from Accept-Encoding; brotli is offered only when the
+    `brotli` package is installed. Responses that are smaller than `minimum_size`,
+    already encoded, or of a media type that does not compress well (images, files)
+    are sent unchanged. Streamed responses are flushed after every chunk, so NDJSON
+    exports and event streams reach the client as they are produced.
+
+    Args:
+        minimum_size (int): Smallest body, in bytes, that is compressed.
+    """
+
+    def __init__(self, app, minimum_size=COMPRESSION_MINIMUM_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.brotli_enabled = brotli_available()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""), self.brotli_enabled)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, compressor, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message
+                headers = Headers(raw=message["headers"])
+                media_type = headers.get("content-type", "")
+                passthrough = "content-encoding" in headers or not media_type.startswith(COMPRESSIBLE_TYPES)
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            if passthrough:
+                if start_message is not None:
+                    await send(start_message)
+                    start_message = None
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start_message is not None:
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start_message)
+                    start_message = None
+                    await send(message)
+                    return
+                compressor = BrotliCompressor() if encoding == "br" else GzipCompressor()
+                headers = MutableHeaders(raw=start_message["headers"])
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                body = compressor.compress(body, not more_body)
+                if more_body:
+                    del headers["Content-Length"]
+                else:
+                    headers["Content-Length"] = str(len(body))
+                await send(start_message)
+                start_message = None
+            else:
+                body = compressor.compress(body, not more_body)
+            await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+
+def install(app):
+    """
+    Enable response compression for the application, unless COMPRESSION_ENABLED=0.
+
+    Args:
+        app (FastAPI): Application whose responses are compressed.
+    """
+    if not COMPRESSION_ENABLED:
+        return
+    app.add_middleware(CompressionMiddleware)
@@ -1,8 +1,16 @@
 from fastapi import HTTPException
+from sqlalchemy import Integer, delete, exists, func, literal, select, update
+from sqlalchemy.exc import IntegrityError
 from starlette import status
 
 from app import models
+from app.cache import response_cache
+from app.database import dialect_insert
+from app.events import post_events
+from app.like_counter import like_counter
+from app.ranking import rescore_posts
 from app.token import create_access_token
+from app.user_stats import change_user_stats, remove_post_from_stats
 from app.utils import hash_password, verify
 
 
@@ -26,18 +34,20 @@ def create_new_user(user, db):
     return new_user
 
 
-def check_if_user_exists(user):
+def check_if_user_exists(user, user_id=None):
     """
     Check if the user exists. If not, raise a 404 Not Found exception.
 
     Args:
         user: User object or None.
+        user_id: ID of the requested user, used in the error message.
 
     Raises:
         HTTPException: If the user does not exist.
     """
     if user is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail=f"User with {user_id} id was not found")
 
 
 def login_user(user_credentials, db):
@@ -80,8 +90,12 @@ def create_new_post(post, current_user, db):
     """
     new_post = models.Post(owner_id=current_user.id, **post.dict())
     db.add(new_post)
+    db.flush()
+    rescore_posts(db, [new_post.id])
+    change_user_stats(db, current_user.id, post_count=1)
     db.commit()
     db.refresh(new_post)
+    response_cache.bump("posts")
 
     return new_post
 
@@ -104,25 +118,27 @@ def get_post(post_id, db, func):
     post = db.query(models.Post, func.count(models.LikePost.post_id).label("likes")).join(models.LikePost,
                                                                                           models.LikePost.post_id == models.Post.id,
                                                                                           isouter=True).group_by(
-        models.Post.id).filter(models.Post.id == post_id).first()
+        models.Post.id).filter(models.Post.id == post_id, models.Post.deleted_at.is_(None)).first()
 
     check_if_exists(post, post_id)
 
     return post
 
 
-def check_if_exists(post):
+def check_if_exists(post, post_id=None):
     """
     Check if the post exists. If not, raise a 404 Not Found exception.
 
     Args:
         post: Post object or None.
+        post_id: ID of the requested object, used in the error message.
 
     Raises:
-        HTTPException: If the post does not
+        HTTPException: If the post does not exist.
     """
     if post is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail=f"Object with {post_id} id was not found")
 
 
 def get_all_posts(db, func, search):
@@ -140,11 +156,35 @@ def get_all_posts(db, func, search):
     results = db.query(models.Post, func.count(models.LikePost.post_id).label("likes")).join(models.LikePost,
                                                                                              models.LikePost.post_id == models.Post.id,
                                                                                              isouter=True).group_by(
-        models.Post.id).filter(models.Post.title.contains(search)).all()
+        models.Post.id).filter(models.Post.title.contains(search), models.Post.deleted_at.is_(None)).all()
 
     return results
 
 
+def select_post_rows(search):
+    """
+    Build a query returning posts as flat column rows.
+
+    Unlike `get_all_posts`, the rows are plain tuples of post, owner and like count
+    columns, so no ORM objects are created for them.
+
+    Args:
+        search (str): Search keyword for filtering posts.
+
+    Returns:
+        Select: Statement yielding rows with post columns, `owner_email`,
+            `owner_created_at` and `likes`.
+    """
+    return select(models.Post.id, models.Post.title, models.Post.content, models.Post.image,
+                  models.Post.created_at, models.Post.owner_id,
+                  models.User.email.label("owner_email"), models.User.created_at.label("owner_created_at"),
+                  func.count(models.LikePost.post_id).label("likes")) \
+        .join(models.User, models.User.id == models.Post.owner_id) \
+        .join(models.LikePost, models.LikePost.post_id == models.Post.id, isouter=True) \
+        .where(models.Post.title.contains(search), models.Post.deleted_at.is_(None)) \
+        .group_by(models.Post.id, models.User.id)
+
+
 def update_post(db, post_id, current_user, post):
     """
     Update a post with new data.
@@ -161,15 +201,16 @@ def update_post(db, post_id, current_user, post):
     Raises:
         HTTPException: If the post does not exist or the user is not the owner.
     """
-    post_query = db.query(models.Post).filter(models.Post.id == post_id)
+    post_query = db.query(models.Post).filter(models.Post.id == post_id, models.Post.deleted_at.is_(None))
     found_post = post_query.first()
 
     check_if_exists(found_post, post_id)
     if found_post.owner_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
 
-    post_query.update(post.dict(), synchronize_session=False)
+    post_query.update({**post.dict(), "version": models.Post.version + 1}, synchronize_session=False)
     db.commit()
+    invalidate_post(post_id)
     return post_query.first()
 
 
@@ -177,6 +218,10 @@ def delete_post_data(db, post_id, current_user):
     """
     Delete a post.
 
+    The post is only marked as deleted and hidden from every read, so the request
+    costs the same however many likes and comments the post has; the reaper purges
+    it and its dependents in small batches later.
+
     Args:
         db (Database): Database session.
         post_id: ID of the post to delete.
@@ -188,19 +233,48 @@ def delete_post_data(db, post_id, current_user):
     Raises:
         HTTPException: If the post does not exist or the user is not the owner.
     """
-    post_query = db.query(models.Post).filter(models.Post.id == post_id)
-    post = post_query.first()
+    post = db.query(models.Post).filter(models.Post.id == post_id, models.Post.deleted_at.is_(None)).first()
 
     check_if_exists(post, post_id)
 
     if post.owner_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
 
-    post_query.delete(synchronize_session=False)
+    post.deleted_at = func.now()
+    db.execute(delete(models.PostScore).where(models.PostScore.post_id == post_id))
+    remove_post_from_stats(db, post)
     db.commit()
+    invalidate_post(post_id)
+    post_events.publish(post_id, "deleted")
     return True
 
 
+def invalidate_post(post_id):
+    """
+    Drop cached responses that include a post: the post itself and the post list.
+
+    Args:
+        post_id: ID of the changed post.
+    """
+    response_cache.bump("post", post_id)
+    response_cache.bump("posts")
+
+
+def record_like(post_id, user_id, delta):
+    """
+    Propagate a committed like or unlike: buffer the counter change, drop cached
+    responses of the post and notify its event listeners.
+
+    Args:
+        post_id: ID of the post.
+        user_id: ID of the user who liked or unliked it.
+        delta (int): +1 for a like, -1 for an unlike.
+    """
+    like_counter.add(post_id, delta)
+    invalidate_post(post_id)
+    post_events.publish(post_id, "like" if delta > 0 else "unlike", user_id=user_id, delta=delta)
+
+
 def like_post_func(db, current_user, like_post):
     """
     Like or unlike a post.
@@ -216,7 +290,7 @@ def like_post_func(db, current_user, like_post):
     Raises:
         HTTPException: If the post does not exist or there is a conflict in the vote.
     """
-    post = db.query(models.Post).filter(models.Post.id == like_post.post_id).first()
+    post = db.query(models.Post).filter(models.Post.id == like_post.post_id, models.Post.deleted_at.is_(None)).first()
 
     if post is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
@@ -230,15 +304,131 @@ def like_post_func(db, current_user, like_post):
         new_vote = models.LikePost(post_id=like_post.post_id, user_id=current_user.id)
         db.add(new_vote)
         db.commit()
+        record_like(like_post.post_id, current_user.id, 1)
         return {"message": "Remove like"}
     else:
         if found_vote is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
         vote_query.delete(synchronize_session=False)
         db.commit()
+        record_like(like_post.post_id, current_user.id, -1)
         return {"message": "Add like"}
 
 
+def like_post_batched(db, current_user, like_post):
+    """
+    Like or unlike a post with a single statement.
+
+    A like is one `INSERT ... SELECT ... WHERE EXISTS ... ON CONFLICT DO NOTHING
+    RETURNING` and an unlike is one `DELETE ... WHERE EXISTS ... RETURNING`, where
+    the EXISTS guard skips posts that are deleted, so the toggle costs one round trip
+    and one commit. Only a like that inserted nothing needs a second lookup to tell
+    a missing post from an existing like. The like counter of the post is updated
+    later by the like counter buffer.
+
+    Args:
+        db (Database): Database session.
+        current_user (User): Currently logged-in user.
+        like_post (LikePost): Like or unlike data.
+
+    Returns:
+        dict: Success message.
+
+    Raises:
+        HTTPException: If the post does not exist or there is a conflict in the vote.
+    """
+    post_exists = exists().where(models.Post.id == like_post.post_id, models.Post.deleted_at.is_(None))
+    if like_post.direction == 1:
+        insert = dialect_insert(db)
+        statement = insert(models.LikePost).from_select(
+            ["post_id", "user_id"],
+            select(literal(like_post.post_id, Integer), literal(current_user.id, Integer)).where(post_exists)) \
+            .on_conflict_do_nothing().returning(models.LikePost.post_id)
+        try:
+            inserted = db.execute(statement).first()
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+        if inserted is None:
+            if not db.scalar(select(post_exists)):
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT)
+        record_like(like_post.post_id, current_user.id, 1)
+        return {"message": "Remove like"}
+
+    statement = delete(models.LikePost).where(models.LikePost.post_id == like_post.post_id,
+                                              models.LikePost.user_id == current_user.id, post_exists) \
+        .returning(models.LikePost.post_id)
+    deleted = db.execute(statement).first()
+    db.commit()
+    if deleted is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    record_like(like_post.post_id, current_user.id, -1)
+    return {"message": "Add like"}
+
+
+def bulk_like_posts(db, current_user, like_posts):
+    """
+    Apply many like/unlike toggles of the current user in one transaction.
+
+    Toggles are grouped by direction: all likes go through one multi-row
+    `INSERT ... ON CONFLICT DO NOTHING RETURNING` and all unlikes through one
+    `DELETE ... RETURNING`. A failed toggle is reported instead of aborting the batch.
+
+    Args:
+        db (Database): Database session.
+        current_user (User): Currently logged-in user.
+        like_posts (List[LikePost]): Like or unlike data.
+
+    Returns:
+        List[dict]: Status of every toggle ("liked", "unliked", "conflict" or "not_found").
+    """
+    like_ids = {item.post_id for item in like_posts if item.direction == 1}
+    unlike_ids = {item.post_id for item in like_posts if item.direction != 1} - like_ids
+
+    existing_ids = set()
+    if like_ids:
+        existing_ids = {post_id for post_id, in db.query(models.Post.id)
+                        .filter(models.Post.id.in_(like_ids), models.Post.deleted_at.is_(None))}
+
+    liked_ids = set()
+    if existing_ids:
+        insert = dialect_insert(db)
+        statement = insert(models.LikePost).values(
+            [{"post_id": post_id, "user_id": current_user.id} for post_id in existing_ids]) \
+            .on_conflict_do_nothing().returning(models.LikePost.post_id)
+        liked_ids = {post_id for post_id, in db.execute(statement)}
+
+    unliked_ids = set()
+    if unlike_ids:
+        live_ids = select(models.Post.id).where(models.Post.id.in_(unlike_ids), models.Post.deleted_at.is_(None))
+        statement = delete(models.LikePost).where(models.LikePost.post_id.in_(live_ids),
+                                                  models.LikePost.user_id == current_user.id) \
+            .returning(models.LikePost.post_id)
+        unliked_ids = {post_id for post_id, in db.execute(statement)}
+    db.commit()
+
+    for post_id in liked_ids:
+        record_like(post_id, current_user.id, 1)
+    for post_id in unliked_ids:
+        record_like(post_id, current_user.id, -1)
+
+    results = []
+    for item in like_posts:
+        if item.direction == 1:
+            if item.post_id not in existing_ids:
+                result = "not_found"
+            else:
+                result = "liked" if item.post_id in liked_ids else "conflict"
+        elif item.post_id in like_ids:
+            result = "conflict"
+        else:
+            result = "unliked" if item.post_id in unliked_ids else "not_found"
+        results.append({"post_id": item.post_id, "direction": item.direction, "status": result})
+    return results
+
+
 def create_new_comment(comment, current_user, db):
     """
     Create a new comment.
@@ -250,16 +440,40 @@ def create_new_comment(comment, current_user, db):
 
     Returns:
         Comment: The created comment object.
+
+    Raises:
+        HTTPException: If the post does not exist.
     """
+    post = db.query(models.Post.id).filter(models.Post.id == comment.post_id, models.Post.deleted_at.is_(None)).first()
+    check_if_exists(post, comment.post_id)
     new_comment = models.Comment(user_id=current_user.id, **comment.dict())
 
     db.add(new_comment)
+    change_comment_count(db, new_comment.post_id, 1)
+    change_user_stats(db, current_user.id, comment_count=1)
     db.commit()
     db.refresh(new_comment)
+    invalidate_post(new_comment.post_id)
+    post_events.publish(new_comment.post_id, "comment",
+                        comment={"id": new_comment.id, "comment": new_comment.comment, "user_id": current_user.id})
 
     return new_comment
 
 
+def change_comment_count(db, post_id, delta):
+    """
+    Update the comment counter and trending score of a post in the current transaction.
+
+    Args:
+        db (Database): Database session.
+        post_id: ID of the commented post.
+        delta (int): +1 for a new comment, -1 for a deleted one.
+    """
+    db.execute(update(models.Post).where(models.Post.id == post_id)
+               .values(comment_count=models.Post.comment_count + delta))
+    rescore_posts(db, [post_id])
+
+
 def delete_comment_data(db, comment_id):
     """
     Delete a comment.
@@ -278,6 +492,11 @@ def delete_comment_data(db, comment_id):
     comment = comment_query.first()
 
     check_if_exists(comment, comment_id)
+    # the deleted comment is expired by the commit and can no longer be loaded
+    post_id, user_id = comment.post_id, comment.user_id
     comment_query.delete(synchronize_session=False)
+    change_comment_count(db, post_id, -1)
+    change_user_stats(db, user_id, comment_count=-1)
     db.commit()
+    invalidate_post(post_id)
     return True
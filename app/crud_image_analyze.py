@@ -1,9 +1,13 @@
-from PIL import Image, ExifTags
 from fastapi import HTTPException
+from sqlalchemy import func
 from starlette import status
 
 from app import models
+from app.cache import response_cache
 from app.color_list import list_color
+from app.image_catalog import extract_image_metadata, refresh_image_metadata
+from app.metrics import time_stage
+from app.tiled_image import convert_color_strips, crop_strips, open_strip_source
 
 
 def create_new_image(image, db):
@@ -17,7 +21,7 @@ def create_new_image(image, db):
     Returns:
         Image: The created image object.
     """
-    new_image = models.Images(**image.dict())
+    new_image = models.Images(**image.dict(), **extract_image_metadata(image.image))
     db.add(new_image)
     db.commit()
     db.refresh(new_image)
@@ -29,6 +33,8 @@ def delete_image_data(db, image_id):
     """
     Delete an image.
 
+    The image is only marked as deleted; the reaper removes its file and row later.
+
     Args:
         db (Database): Database session.
         image_id: ID of the image to delete.
@@ -39,15 +45,15 @@ def delete_image_data(db, image_id):
     Raises:
         HTTPException: If the image does not exist.
     """
-    image_query = db.query(models.Image).filter(models.Image.id == image_id)
-    image = image_query.first()
+    image = db.query(models.Images).filter(models.Images.id == image_id, models.Images.deleted_at.is_(None)).first()
 
-    if image.id is None:
+    if image is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail=f"Image with {image_id} id was not found")
 
-    image_query.delete(synchronize_session=False)
+    image.deleted_at = func.now()
     db.commit()
+    response_cache.bump("image", image_id)
     return True
 
 
@@ -65,15 +71,17 @@ def image_detail_data(db, image_id):
     Raises:
         HTTPException: If the image does not exist.
     """
-    image_query = db.query(models.Images).filter(models.Images.id == image_id)
-    image = image_query.first()
+    from PIL import Image, ExifTags
+
+    image = db.query(models.Images).filter(models.Images.id == image_id, models.Images.deleted_at.is_(None)).first()
 
-    if image.id is None:
+    if image is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail=f"Image with {image_id} id was not found")
 
-    image_info = Image.open(image.image)
-    detail = image_info._getexif()
+    with time_stage("image_detail", "decode"):
+        image_info = Image.open(image.image)
+        detail = image_info._getexif()
     detail_dict = {}
     if detail:
         for key, val in detail.items():
@@ -98,6 +106,8 @@ def update_tag_data(image_id, tag, db):
     Raises:
         HTTPException: If the image does not exist.
     """
+    from PIL import Image, ExifTags
+
     tag_data = tag.dict()
     tag_name = tag_data.get('tag_name')
     tag_data = tag_data.get('tag_data')
@@ -105,22 +115,27 @@ def update_tag_data(image_id, tag, db):
         new_data = int(tag_data)
     except:
         print('')
-    image_query = db.query(models.Images).filter(models.Images.id == image_id)
-    image = image_query.first()
+    image = db.query(models.Images).filter(models.Images.id == image_id, models.Images.deleted_at.is_(None)).first()
 
-    if image.id is None:
+    if image is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail=f"Image with {image_id} id was not found")
 
-    image_info = Image.open(image.image)
-    exif = image_info.getexif()
+    with time_stage("update_tag", "decode"):
+        image_info = Image.open(image.image)
+        image_info.load()
+        exif = image_info.getexif()
 
     for k, v in ExifTags.TAGS.items():
         if v == tag_name:
             key_tag = k
 
     exif[key_tag] = new_data
-    image_info.save(f'{image.image}', exif=exif)
+    with time_stage("update_tag", "save"):
+        image_info.save(f'{image.image}', exif=exif)
+    refresh_image_metadata(db, image_id, image.image)
+    db.commit()
+    response_cache.bump("image", image_id)
     return True
 
 
@@ -139,17 +154,20 @@ def remove_tag_data(image_id, tag, db):
     Raises:
         HTTPException: If the image does not exist.
     """
+    from PIL import Image, ExifTags
+
     tag_data = tag.dict()
     tag_name = tag_data.get('tag_name')
-    image_query = db.query(models.Images).filter(models.Images.id == image_id)
-    image = image_query.first()
+    image = db.query(models.Images).filter(models.Images.id == image_id, models.Images.deleted_at.is_(None)).first()
 
-    if image.id is None:
+    if image is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail=f"Image with {image_id} id was not found")
 
-    image_info = Image.open(image.image)
-    exif = image_info.getexif()
+    with time_stage("remove_tag", "decode"):
+        image_info = Image.open(image.image)
+        image_info.load()
+        exif = image_info.getexif()
 
     for k, v in ExifTags.TAGS.items():
         if v == tag_name:
@@ -158,7 +176,11 @@ def remove_tag_data(image_id, tag, db):
 
     if key_tag in exif:
         del exif[key_tag]
-    image_info.save(f'{image.image}', exif=exif)
+    with time_stage("remove_tag", "save"):
+        image_info.save(f'{image.image}', exif=exif)
+    refresh_image_metadata(db, image_id, image.image)
+    db.commit()
+    response_cache.bump("image", image_id)
 
     return True
 
@@ -178,17 +200,34 @@ def update_color(image_id, colors, db):
     Raises:
         HTTPException: If the image does not exist.
     """
-    image_query = db.query(models.Images).filter(models.Images.id == image_id)
-    image = image_query.first()
+    from PIL import Image
 
-    if image.id is None:
+    image = db.query(models.Images).filter(models.Images.id == image_id, models.Images.deleted_at.is_(None)).first()
+
+    if image is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail=f"Image with {image_id} id was not found")
 
-    image_info = Image.open(image.image)
     rgb = list_color.get(colors.color_code)
-    gray_img = image_info.convert("RGB", (rgb))
-    gray_img.save(f'{image.image}')
+    source = open_strip_source(image.image)
+    if source is not None:
+        with time_stage("update_color", "strips"):
+            convert_color_strips(source, rgb)
+        refresh_image_metadata(db, image_id, image.image)
+        db.commit()
+        response_cache.bump("image", image_id)
+        return True
+
+    with time_stage("update_color", "decode"):
+        image_info = Image.open(image.image)
+        image_info.load()
+    with time_stage("update_color", "transform"):
+        gray_img = image_info.convert("RGB", (rgb))
+    with time_stage("update_color", "save"):
+        gray_img.save(f'{image.image}')
+    refresh_image_metadata(db, image_id, image.image)
+    db.commit()
+    response_cache.bump("image", image_id)
     return True
 
 
@@ -207,28 +246,50 @@ def update_size(image_id, sizes, db):
         Raises:
             HTTPException: If the image does not exist.
         """
-    image_query = db.query(models.Images).filter(models.Images.id == image_id)
-    image = image_query.first()
+    from PIL import Image
+
+    image = db.query(models.Images).filter(models.Images.id == image_id, models.Images.deleted_at.is_(None)).first()
 
-    if image.id is None:
+    if image is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail=f"Image with {image_id} id was not found")
 
-    image_info = Image.open(image.image)
-
     (left, upper, right, lower) = (sizes.left, sizes.upper, sizes.right, sizes.lower)
     (width, height) = (sizes.width, sizes.height)
 
+    # resizing needs the whole image, so only a plain crop is done in strips
+    if width is None and height is None and None not in (left, upper, right, lower):
+        source = open_strip_source(image.image)
+        if source is not None:
+            with time_stage("update_size", "strips"):
+                cropped = crop_strips(source, (int(left), int(upper), int(right), int(lower)))
+            if cropped:
+                refresh_image_metadata(db, image_id, image.image)
+                db.commit()
+                response_cache.bump("image", image_id)
+                return True
+
+    with time_stage("update_size", "decode"):
+        image_info = Image.open(image.image)
+        image_info.load()
+
     try:
-        new_image = image_info.crop((int(left), int(upper), int(right), int(lower)))
-        new_image.save(f'{image.image}')
+        with time_stage("update_size", "transform"):
+            new_image = image_info.crop((int(left), int(upper), int(right), int(lower)))
+        with time_stage("update_size", "save"):
+            new_image.save(f'{image.image}')
     except:
         print('ok')
 
     try:
-        new_image = image_info.resize((int(width), int(height)))
-        new_image.save(f'{image.image}')
+        with time_stage("update_size", "transform"):
+            new_image = image_info.resize((int(width), int(height)))
+        with time_stage("update_size", "save"):
+            new_image.save(f'{image.image}')
     except:
         print('ok')
 
+    refresh_image_metadata(db, image_id, image.image)
+    db.commit()
+    response_cache.bump("image", image_id)
     return True
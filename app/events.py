@@ -0,0 +1,250 @@
+import asyncio
+import json
+import logging
+import os
+import select
+import threading
+from collections import defaultdict
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy import text
+
+from app.metrics import EVENT_SUBSCRIBERS, EVENTS_DROPPED
+
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", 100))
+EVENTS_KEEPALIVE_SECONDS = float(os.getenv("EVENTS_KEEPALIVE_SECONDS", 15))
+EVENTS_BRIDGE = os.getenv("EVENTS_BRIDGE", "none")
+EVENTS_CHANNEL = "post_events"
+# NOTIFY payloads must stay below 8000 bytes
+EVENTS_MAX_PAYLOAD = 7900
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """
+    Bounded queue of the events of one post for one listener.
+
+    Events may be offered from any thread; they are put into the queue on the
+    event loop the subscription was created on. A listener that falls
+    `queue_size` events behind is dropped: its queue is emptied and closed, so a
+    slow client never holds an unbounded backlog.
+
+    Args:
+        post_id: ID of the post.
+        queue_size (int): Events buffered before the listener is dropped.
+    """
+
+    def __init__(self, post_id, queue_size=EVENTS_QUEUE_SIZE):
+        self.post_id = post_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = False
+
+    def offer(self, event):
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # the loop of the listener is already closed
+            pass
+
+    def _put(self, event):
+        if self.dropped:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped = True
+            EVENTS_DROPPED.inc()
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+    async def get(self, timeout):
+        """
+        Wait for the next event.
+
+        Returns:
+            dict: The event, or None once the listener was dropped.
+
+        Raises:
+            asyncio.TimeoutError: If no event arrived within `timeout` seconds.
+        """
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class EventBroker:
+    """
+    In-process publish/subscribe of post activity.
+
+    Write paths publish events after their transaction committed; listeners of
+    `/posts/{post_id}/events` subscribe to one post. Without a bridge an event only
+    reaches listeners connected to the same worker; with a PostgresBridge it is
+    sent through NOTIFY and every worker dispatches it to its own listeners.
+    """
+
+    def __init__(self):
+        self.bridge = None
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, post_id, queue_size=EVENTS_QUEUE_SIZE):
+        subscription = Subscription(post_id, queue_size)
+        with self._lock:
+            self._subscribers[post_id].add(subscription)
+        EVENT_SUBSCRIBERS.inc()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.post_id)
+            if subscribers is None or subscription not in subscribers:
+                return
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.post_id]
+        EVENT_SUBSCRIBERS.dec()
+
+    def publish(self, post_id, event_type, **data):
+        """
+        Publish an event of a post; safe to call from any thread.
+
+        Args:
+            post_id: ID of the post.
+            event_type (str): "like", "unlike", "comment" or "deleted".
+            **data: JSON-compatible event fields.
+        """
+        event = {"type": event_type, "post_id": post_id, **data}
+        if self.bridge is None:
+            self.dispatch(event)
+            return
+        try:
+            self.bridge.send(event)
+        except Exception:
+            # the write itself is committed; listeners just miss this event
+            logger.exception("Failed to send post event %s", event)
+
+    def dispatch(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(event["post_id"], ()))
+        for subscription in subscribers:
+            subscription.offer(event)
+
+
+class PostgresBridge:
+    """
+    Relay of post events between workers through Postgres LISTEN/NOTIFY.
+
+    Events are sent with `pg_notify` on a pooled connection. A daemon thread holds a
+    dedicated psycopg2 connection listening on the channel, and dispatches every
+    notification, including the worker's own, to the broker. It reconnects after
+    connection errors.
+
+    Args:
+        broker (EventBroker): Broker receiving the notifications.
+        engine (Engine): Engine of the Postgres database.
+        channel (str): Notification channel.
+    """
+
+    def __init__(self, broker, engine, channel=EVENTS_CHANNEL):
+        self.broker = broker
+        self.engine = engine
+        self.channel = channel
+        self._stop = threading.Event()
+        self._thread = None
+
+    def send(self, event):
+        payload = json.dumps(event, default=str)
+        if len(payload.encode()) > EVENTS_MAX_PAYLOAD:
+            payload = json.dumps({key: value for key, value in event.items() if key != "comment"}, default=str)
+        with self.engine.connect() as connection:
+            connection.execute(text("SELECT pg_notify(:channel, :payload)"),
+                               {"channel": self.channel, "payload": payload})
+            connection.commit()
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="post-events-listener", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._listen()
+            except Exception:
+                logger.exception("Post event listener failed, reconnecting")
+                self._stop.wait(1)
+
+    def _listen(self):
+        import psycopg2
+
+        dsn = self.engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+        connection = psycopg2.connect(dsn)
+        try:
+            connection.autocommit = True
+            with connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {self.channel}")
+            while not self._stop.is_set():
+                if select.select([connection], [], [], 1.0)[0]:
+                    connection.poll()
+                    while connection.notifies:
+                        notification = connection.notifies.pop(0)
+                        self.broker.dispatch(json.loads(notification.payload))
+        finally:
+            connection.close()
+
+
+async def iter_events(broker, post_id, keepalive=EVENTS_KEEPALIVE_SECONDS):
+    """
+    Yield the events of a post in the server-sent events format.
+
+    A comment line is sent after `keepalive` seconds without events, so proxies keep
+    the connection open. The stream ends with a "dropped" event if the client could
+    not keep up; it may reconnect and reload the post.
+    """
+    subscription = broker.subscribe(post_id)
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            try:
+                event = await subscription.get(keepalive)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if event is None:
+                yield "event: dropped\ndata: {}\n\n"
+                return
+            yield f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+    finally:
+        broker.unsubscribe(subscription)
+
+
+def event_stream_response(post_id):
+    return StreamingResponse(iter_events(post_events, post_id), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+post_events = EventBroker()
+
+
+def install(app, engine):
+    """
+    Relay post events between workers when EVENTS_BRIDGE=postgres.
+
+    Args:
+        app (FastAPI): Application publishing the events.
+        engine (Engine): Engine of the Postgres database.
+    """
+    if EVENTS_BRIDGE != "postgres":
+        return
+    bridge = PostgresBridge(post_events, engine)
+    post_events.bridge = bridge
+    app.add_event_handler("startup", bridge.start)
+    app.add_event_handler("shutdown", bridge.stop)
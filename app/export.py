@@ -0,0 +1,121 @@
+import csv
+import io
+
+import orjson
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from starlette import status
+
+from app import models
+from app.database import SessionLocal
+
+EXPORT_CHUNK_ROWS = 1000
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def select_export(kind, since=None, until=None, owner_id=None):
+    """
+    Build the query of an export.
+
+    Args:
+        kind (str): "posts", "comments" or "images".
+        since (datetime): Only rows created at or after this time (posts only).
+        until (datetime): Only rows created before this time (posts only).
+        owner_id (int): Only posts owned by / comments written by this user.
+
+    Returns:
+        Select: Statement of the exported columns.
+
+    Raises:
+        HTTPException: If a filter is not supported by the exported table.
+    """
+    if kind == "posts":
+        statement = select(models.Post.id, models.Post.title, models.Post.content, models.Post.image,
+                           models.Post.owner_id, models.Post.like_count, models.Post.created_at) \
+            .where(models.Post.deleted_at.is_(None)).order_by(models.Post.id)
+        if since is not None:
+            statement = statement.where(models.Post.created_at >= since)
+        if until is not None:
+            statement = statement.where(models.Post.created_at < until)
+        if owner_id is not None:
+            statement = statement.where(models.Post.owner_id == owner_id)
+        return statement
+
+    if since is not None or until is not None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"Date filters are not supported for {kind}")
+
+    if kind == "comments":
+        statement = select(models.Comment.id, models.Comment.comment, models.Comment.user_id,
+                           models.Comment.post_id) \
+            .where(models.Comment.post_id.in_(select(models.Post.id).where(models.Post.deleted_at.is_(None)))) \
+            .order_by(models.Comment.id)
+        if owner_id is not None:
+            statement = statement.where(models.Comment.user_id == owner_id)
+        return statement
+
+    if owner_id is not None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"Owner filter is not supported for {kind}")
+    return select(models.Images.id, models.Images.image, models.Images.created_at, models.Images.width,
+                  models.Images.height, models.Images.format, models.Images.file_size, models.Images.camera_make,
+                  models.Images.camera_model, models.Images.taken_at) \
+        .where(models.Images.deleted_at.is_(None)).order_by(models.Images.id)
+
+
+def encode_ndjson(rows, columns):
+    return b"".join(orjson.dumps(dict(zip(columns, row))) + b"\n" for row in rows)
+
+
+def encode_csv(rows, columns):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows(rows)
+    return buffer.getvalue().encode()
+
+
+def iter_export(statement, export_format, chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    Yield the encoded rows of a query chunk by chunk.
+
+    Rows are fetched through a server-side cursor (`stream_results`) in batches of
+    `chunk_rows`, so memory use does not depend on the size of the table. The
+    generator runs after the request dependencies are closed and therefore uses
+    its own session.
+
+    Args:
+        statement: Select statement to export.
+        export_format (str): "ndjson" or "csv".
+        chunk_rows (int): Rows fetched and encoded per chunk.
+
+    Yields:
+        bytes: Encoded chunk.
+    """
+    encode = encode_ndjson if export_format == "ndjson" else encode_csv
+    db = SessionLocal()
+    try:
+        result = db.execute(statement.execution_options(stream_results=True, yield_per=chunk_rows))
+        columns = list(result.keys())
+        if export_format == "csv":
+            yield encode_csv([columns], columns)
+        for rows in result.partitions():
+            yield encode(rows, columns)
+    finally:
+        db.close()
+
+
+def export_response(kind, export_format, since=None, until=None, owner_id=None):
+    """
+    Stream a table export as NDJSON or CSV.
+
+    Returns:
+        StreamingResponse: Export sent as an attachment.
+    """
+    statement = select_export(kind, since, until, owner_id)
+    return StreamingResponse(iter_export(statement, export_format), media_type=EXPORT_FORMATS[export_format],
+                             headers={"Content-Disposition": f'attachment; filename="{kind}.{export_format}"'})
@@ -0,0 +1,89 @@
+import orjson
+from fastapi.responses import ORJSONResponse, StreamingResponse
+
+from app.database import SessionLocal
+
+STREAM_CHUNK_ROWS = 500
+
+
+def post_row_to_dict(row):
+    """
+    Build the `PostOut` shape from a flat row of post, owner and like columns.
+
+    Args:
+        row: Row produced by `crud_blog.select_post_rows`.
+
+    Returns:
+        dict: Post with nested owner and like count, ready for orjson.
+    """
+    return {
+        "Post": {
+            "title": row.title,
+            "content": row.content,
+            "image": row.image,
+            "id": row.id,
+            "created_at": row.created_at,
+            "owner_id": row.owner_id,
+            "owner": {
+                "id": row.owner_id,
+                "email": row.owner_email,
+                "created_at": row.owner_created_at,
+            },
+        },
+        "likes": row.likes,
+    }
+
+
+def posts_response(db, statement):
+    """
+    Run a post query and encode the result with orjson in one go.
+
+    Args:
+        db (Database): Database session.
+        statement: Select statement returning post rows.
+
+    Returns:
+        ORJSONResponse: Encoded list of posts.
+    """
+    rows = db.execute(statement)
+    return ORJSONResponse([post_row_to_dict(row) for row in rows])
+
+
+def iter_json_array(statement, chunk_rows=STREAM_CHUNK_ROWS):
+    """
+    Yield a JSON array of posts chunk by chunk.
+
+    The generator runs after the request dependencies have been closed, so it opens
+    its own session and fetches rows in batches of `chunk_rows`.
+
+    Args:
+        statement: Select statement returning post rows.
+        chunk_rows (int): Number of rows encoded per chunk.
+
+    Yields:
+        bytes: Parts of the JSON array.
+    """
+    db = SessionLocal()
+    try:
+        result = db.execute(statement.execution_options(yield_per=chunk_rows))
+        separator = b"["
+        for rows in result.partitions():
+            yield separator + b",".join(orjson.dumps(post_row_to_dict(row)) for row in rows)
+            separator = b","
+        yield b"[]" if separator == b"[" else b"]"
+    finally:
+        db.close()
+
+
+def stream_posts_response(statement, chunk_rows=STREAM_CHUNK_ROWS):
+    """
+    Stream a post query as a JSON array.
+
+    Args:
+        statement: Select statement returning post rows.
+        chunk_rows (int): Number of rows encoded per chunk.
+
+    Returns:
+        StreamingResponse: Chunked JSON response.
+    """
+    return StreamingResponse(iter_json_array(statement, chunk_rows), media_type="application/json")
@@ -0,0 +1,81 @@
+import hashlib
+import os
+
+from starlette import status
+from starlette.responses import Response
+
+HTTP_CACHE_MAX_AGE = int(os.getenv("HTTP_CACHE_MAX_AGE", 0))
+
+
+def weak_etag(*parts):
+    """
+    Build a weak entity tag from the parts identifying a representation.
+
+    Weak tags stay valid whatever content encoding the response is sent with.
+    """
+    return 'W/"' + "-".join(str(part) for part in parts) + '"'
+
+
+def post_etag(post_id, version, likes):
+    return weak_etag("post", post_id, version, likes)
+
+
+def post_list_etag(rows):
+    """
+    Tag a list of posts from the (id, version, likes) of its rows.
+
+    Args:
+        rows: Iterable of (post id, post version, like count) tuples.
+
+    Returns:
+        str: Weak entity tag.
+    """
+    digest = hashlib.blake2b(digest_size=12)
+    for post_id, version, likes in rows:
+        digest.update(f"{post_id}.{version}.{likes};".encode())
+    return weak_etag("posts", digest.hexdigest())
+
+
+def file_etag(kind, entity_id, path):
+    """
+    Tag a representation derived from a file by the file's modification time and size.
+    """
+    stat = os.stat(path)
+    return weak_etag(kind, entity_id, stat.st_mtime_ns, stat.st_size)
+
+
+def etag_matches(if_none_match, etag):
+    """
+    Weakly compare an If-None-Match header with an entity tag.
+    """
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def conditional_response(request, response, etag, max_age=HTTP_CACHE_MAX_AGE):
+    """
+    Add validators to a response and answer conditional requests.
+
+    Args:
+        request (Request): Incoming request.
+        response (Response): Response whose headers are set when the body is sent.
+        etag (str): Entity tag of the current representation.
+        max_age (int): Seconds clients may reuse the response without revalidating.
+
+    Returns:
+        Response: An empty 304 response if the client's copy is current, otherwise None.
+    """
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={max_age}, must-revalidate"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None and etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return None
@@ -0,0 +1,188 @@
+"""
+Catalogue of images: metadata columns extracted from the image files.
+
+    python -m app.image_catalog backfill
+
+The columns are filled when an image is created or changed; the backfill command
+extracts them for rows that have none yet, e.g. images stored before the columns
+existed.
+"""
+import argparse
+import operator
+import os
+from datetime import datetime
+
+from sqlalchemy import and_, or_, select, update
+
+from app import models
+from app.database import SessionLocal
+
+IMAGE_BACKFILL_BATCH = 500
+
+EXIF_IFD = 0x8769
+EXIF_MAKE = 271
+EXIF_MODEL = 272
+EXIF_DATETIME = 306
+EXIF_DATETIME_ORIGINAL = 36867
+
+
+def parse_exif_datetime(value):
+    try:
+        return datetime.strptime(str(value).strip("\x00 "), "%Y:%m:%d %H:%M:%S")
+    except ValueError:
+        return None
+
+
+def exif_text(value):
+    if value is None:
+        return None
+    value = str(value).strip("\x00 ")
+    return value or None
+
+
+def extract_image_metadata(path):
+    """
+    Read the catalogue columns of an image file.
+
+    Only the header is parsed: Pillow opens images lazily and keeps the EXIF block
+    it finds there, so no pixel data is decoded.
+
+    Args:
+        path (str): Path of the image file.
+
+    Returns:
+        dict: Column values; all None if the file is missing or not an image.
+    """
+    from PIL import Image, UnidentifiedImageError
+
+    metadata = dict.fromkeys(("width", "height", "format", "file_size", "camera_make", "camera_model", "taken_at"))
+    try:
+        metadata["file_size"] = os.path.getsize(path)
+        with Image.open(path) as image:
+            metadata["width"], metadata["height"] = image.size
+            metadata["format"] = image.format
+            exif = image.getexif()
+    except (OSError, UnidentifiedImageError):
+        return metadata
+    metadata["camera_make"] = exif_text(exif.get(EXIF_MAKE))
+    metadata["camera_model"] = exif_text(exif.get(EXIF_MODEL))
+    taken = exif.get_ifd(EXIF_IFD).get(EXIF_DATETIME_ORIGINAL) or exif.get(EXIF_DATETIME)
+    metadata["taken_at"] = parse_exif_datetime(taken) if taken else None
+    return metadata
+
+
+def refresh_image_metadata(db, image_id, path):
+    """
+    Store the metadata of an image file in its row.
+
+    Args:
+        db (Database): Database session; the caller commits.
+        image_id: ID of the image.
+        path (str): Path of the image file.
+    """
+    db.execute(update(models.Images).where(models.Images.id == image_id).values(**extract_image_metadata(path)))
+
+
+def list_images(db, limit, sort="uploaded", before_id=None, before_taken_at=None, image_format=None,
+                min_width=None, max_width=None, min_height=None, max_height=None, min_size=None, max_size=None,
+                uploaded_after=None, uploaded_before=None, camera_make=None, camera_model=None,
+                taken_after=None, taken_before=None):
+    """
+    Get a page of the image catalogue, newest first.
+
+    Only the extracted columns are read, never the files. Pages are addressed by the
+    sort key of the last image of the previous page, so deep pages cost the same as
+    the first one; every filter is served by an index of the images table.
+
+    Args:
+        db (Database): Database session.
+        limit (int): Page size.
+        sort (str): "uploaded" to order by upload, "taken" by EXIF date taken; images
+            without a date taken are left out of the latter.
+        before_id (int): ID of the last image of the previous page.
+        before_taken_at (datetime): Date taken of the last image of the previous
+            page, when sorting by "taken".
+        image_format (str): Pillow format name, e.g. "JPEG".
+        min_width, max_width, min_height, max_height (int): Pixel dimension bounds.
+        min_size, max_size (int): File size bounds in bytes.
+        uploaded_after, uploaded_before (datetime): Upload time range.
+        camera_make, camera_model (str): Exact EXIF camera make and model.
+        taken_after, taken_before (datetime): EXIF date taken range.
+
+    Returns:
+        List[Images]: Images of the page.
+    """
+    table = models.Images
+    conditions = [table.deleted_at.is_(None)]
+    for column, compare, value in (
+            (table.format, operator.eq, image_format.upper() if image_format else None),
+            (table.camera_make, operator.eq, camera_make),
+            (table.camera_model, operator.eq, camera_model),
+            (table.width, operator.ge, min_width), (table.width, operator.le, max_width),
+            (table.height, operator.ge, min_height), (table.height, operator.le, max_height),
+            (table.file_size, operator.ge, min_size), (table.file_size, operator.le, max_size),
+            (table.created_at, operator.ge, uploaded_after), (table.created_at, operator.lt, uploaded_before),
+            (table.taken_at, operator.ge, taken_after), (table.taken_at, operator.lt, taken_before)):
+        if value is not None:
+            conditions.append(compare(column, value))
+
+    statement = select(table)
+    if sort == "taken":
+        conditions.append(table.taken_at.is_not(None))
+        if before_taken_at is not None and before_id is not None:
+            conditions.append(or_(table.taken_at < before_taken_at,
+                                  and_(table.taken_at == before_taken_at, table.id < before_id)))
+        statement = statement.order_by(table.taken_at.desc(), table.id.desc())
+    else:
+        if before_id is not None:
+            conditions.append(table.id < before_id)
+        statement = statement.order_by(table.id.desc())
+    return db.scalars(statement.where(*conditions).limit(limit)).all()
+
+
+def backfill_metadata(db, batch_size=IMAGE_BACKFILL_BATCH):
+    """
+    Extract the metadata of every image that has none, one batch per transaction.
+
+    Rows whose file cannot be read keep empty columns and are skipped.
+
+    Args:
+        db (Database): Database session.
+        batch_size (int): Images per batch.
+
+    Returns:
+        int: Number of images whose metadata was extracted.
+    """
+    filled = 0
+    last_id = 0
+    while True:
+        rows = db.execute(select(models.Images.id, models.Images.image)
+                          .where(models.Images.id > last_id, models.Images.file_size.is_(None),
+                                 models.Images.deleted_at.is_(None))
+                          .order_by(models.Images.id).limit(batch_size)).all()
+        if not rows:
+            return filled
+        for image_id, path in rows:
+            metadata = extract_image_metadata(path)
+            if metadata["file_size"] is not None:
+                db.execute(update(models.Images).where(models.Images.id == image_id).values(**metadata))
+                filled += 1
+        db.commit()
+        last_id = rows[-1][0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the metadata columns of the image catalogue.")
+    parser.add_argument("command", choices=["backfill"])
+    parser.add_argument("--batch-size", type=int, default=IMAGE_BACKFILL_BATCH)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        print(f"Extracted metadata of {backfill_metadata(db, args.batch_size)} images")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import logging
+import os
+import threading
+from collections import defaultdict
+
+from sqlalchemy import bindparam, update
+
+from app import models
+from app.database import SessionLocal
+from app.ranking import rescore_posts
+from app.user_stats import apply_likes_received
+
+LIKE_WRITE_MODE = os.getenv("LIKE_WRITE_MODE", "default")
+LIKE_FLUSH_INTERVAL = float(os.getenv("LIKE_FLUSH_INTERVAL", 1.0))
+
+logger = logging.getLogger(__name__)
+
+
+class LikeCounterBuffer:
+    """
+    Buffer like count deltas in memory and write them to `posts.like_count` in batches.
+
+    Every like or unlike adds +1/-1 for its post. A background thread flushes the
+    accumulated deltas every `interval` seconds with a single executemany UPDATE, so
+    a burst of likes on a viral post costs one row update per flush instead of one
+    per click. The trending scores of the flushed posts and the received like
+    counters of their owners are updated in the same transaction. Counters are
+    eventually consistent: they lag by at most one interval, and deltas still
+    buffered when a worker is killed are lost.
+
+    Args:
+        session_factory: Callable returning a new database session.
+        interval (float): Seconds between flushes.
+    """
+
+    def __init__(self, session_factory=SessionLocal, interval=LIKE_FLUSH_INTERVAL):
+        self.session_factory = session_factory
+        self.interval = interval
+        self._pending = defaultdict(int)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add(self, post_id, delta):
+        """
+        Record a change of the like count of a post.
+
+        Args:
+            post_id: ID of the post.
+            delta (int): +1 for a like, -1 for an unlike.
+        """
+        with self._lock:
+            self._pending[post_id] += delta
+            if self._thread is None:
+                self._start()
+
+    def _start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="like-counter-flush", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Failed to flush like counters")
+
+    def flush(self):
+        """
+        Write all buffered deltas to the database.
+
+        Returns:
+            int: Number of posts whose counter was updated.
+        """
+        with self._lock:
+            pending = {post_id: delta for post_id, delta in self._pending.items() if delta}
+            self._pending.clear()
+        if not pending:
+            return 0
+
+        statement = update(models.Post.__table__).where(
+            models.Post.__table__.c.id == bindparam("post_id")).values(
+            like_count=models.Post.__table__.c.like_count + bindparam("delta"))
+        db = self.session_factory()
+        try:
+            db.execute(statement, [{"post_id": post_id, "delta": delta} for post_id, delta in pending.items()])
+            rescore_posts(db, pending)
+            apply_likes_received(db, pending)
+            db.commit()
+        except Exception:
+            db.rollback()
+            with self._lock:
+                for post_id, delta in pending.items():
+                    self._pending[post_id] += delta
+            raise
+        finally:
+            db.close()
+        return len(pending)
+
+    def stop(self):
+        """
+        Stop the background thread and flush what is left.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+
+like_counter = LikeCounterBuffer()
@@ -1,10 +1,15 @@
 from fastapi import FastAPI
 
-from . import routes
+from . import compression, events, metrics, profiling, rate_limit, reaper, routes, warmup
+from .database import engine
+from .like_counter import like_counter
 from fastapi.middleware.cors import CORSMiddleware
 
 app = FastAPI()
 
+# Installed first so it runs inside CORS and metrics, which then see shed requests.
+rate_limit.install(app)
+
 origins = ["*"]
 
 app.add_middleware(
@@ -15,5 +20,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+compression.install(app)
+metrics.install(app, engine)
+profiling.install(app, engine)
+events.install(app, engine)
+reaper.install(app)
 
 app.include_router(routes.router)
+
+
+@app.on_event("shutdown")
+def flush_like_counters():
+    like_counter.stop()
+
+
+if warmup.WARMUP_ENABLED:
+    app.add_event_handler("startup", warmup.warm_up)
@@ -0,0 +1,201 @@
+import contextvars
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, \
+    generate_latest, multiprocess
+from sqlalchemy import event
+from starlette.responses import Response
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+
+REQUEST_LATENCY = Histogram("http_request_duration_seconds", "HTTP request latency.",
+                            ["method", "route", "status"])
+REQUEST_DB_QUERIES = Histogram("http_request_db_queries", "Database queries issued per HTTP request.",
+                               ["route"], buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, float("inf")))
+REQUEST_DB_TIME = Histogram("http_request_db_duration_seconds", "Time spent in database queries per HTTP request.",
+                            ["route"])
+DB_QUERY_DURATION = Histogram("db_query_duration_seconds", "Duration of a single database query.")
+DB_QUERIES = Counter("db_queries", "Database queries issued.")
+DB_POOL_CHECKED_OUT = Gauge("db_pool_checked_out_connections", "Connections currently checked out of the pool.",
+                            multiprocess_mode="livesum")
+DB_POOL_SIZE = Gauge("db_pool_size", "Configured size of the connection pool.", multiprocess_mode="livesum")
+IMAGE_STAGE_DURATION = Histogram("image_stage_duration_seconds", "Duration of image pipeline stages.",
+                                 ["operation", "stage"])
+PASSWORD_HASH_DURATION = Histogram("password_hash_duration_seconds", "Duration of bcrypt operations.",
+                                   ["operation"])
+EVENT_SUBSCRIBERS = Gauge("post_event_subscribers", "Open post event streams.", multiprocess_mode="livesum")
+EVENTS_DROPPED = Counter("post_event_subscribers_dropped", "Post event streams closed for falling behind.")
+REQUESTS_SHED = Counter("http_requests_shed", "Requests rejected by admission control.", ["policy", "reason"])
+REAPER_ROWS_PURGED = Counter("reaper_rows_purged", "Rows of soft-deleted entities purged.", ["table"])
+REAPER_FILES_REMOVED = Counter("reaper_files_removed", "Files of deleted images removed.")
+REAPER_BACKLOG = Gauge("reaper_backlog", "Soft-deleted entities waiting to be purged.", ["entity"],
+                       multiprocess_mode="livemax")
+
+_request_stats = contextvars.ContextVar("request_stats", default=None)
+
+
+class RequestStats:
+    """
+    Database activity of the request being handled.
+
+    One instance is shared through a context variable by the middleware, the
+    threadpool running the endpoint and the SQLAlchemy event hooks.
+    """
+
+    __slots__ = ("queries", "db_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+
+
+@contextmanager
+def time_stage(operation, stage):
+    """
+    Record the duration of an image pipeline stage.
+
+    Args:
+        operation (str): Image operation, e.g. "update_color".
+        stage (str): Pipeline stage: "decode", "transform" or "save", or "strips"
+            for images processed a strip at a time.
+    """
+    if not METRICS_ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        IMAGE_STAGE_DURATION.labels(operation, stage).observe(time.perf_counter() - start)
+
+
+@contextmanager
+def time_password_hash(operation):
+    """
+    Record the duration of a bcrypt hash or verify call.
+
+    Args:
+        operation (str): "hash" or "verify".
+    """
+    if not METRICS_ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        PASSWORD_HASH_DURATION.labels(operation).observe(time.perf_counter() - start)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # kept on the execution context, which is dropped with a statement that fails
+    context._query_start_time = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, "_query_start_time", None)
+    if start is None:
+        return
+    duration = time.perf_counter() - start
+    DB_QUERIES.inc()
+    DB_QUERY_DURATION.observe(duration)
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += duration
+
+
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    DB_POOL_CHECKED_OUT.inc()
+
+
+def _on_checkin(dbapi_connection, connection_record):
+    DB_POOL_CHECKED_OUT.dec()
+
+
+def instrument_engine(engine):
+    """
+    Count and time queries and track pool usage of an engine.
+
+    Args:
+        engine (Engine): SQLAlchemy engine to instrument.
+    """
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine.pool, "checkout", _on_checkout)
+    event.listen(engine.pool, "checkin", _on_checkin)
+    size = getattr(engine.pool, "size", None)
+    if callable(size):
+        DB_POOL_SIZE.set(size())
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency and database activity per route.
+
+    Implemented as plain ASGI rather than with `BaseHTTPMiddleware`, so response
+    bodies are passed through without being re-streamed.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            duration = time.perf_counter() - start
+            _request_stats.reset(token)
+            route = scope.get("route")
+            route_path = route.path if route is not None else "unmatched"
+            REQUEST_LATENCY.labels(scope["method"], route_path, status_code).observe(duration)
+            REQUEST_DB_QUERIES.labels(route_path).observe(stats.queries)
+            REQUEST_DB_TIME.labels(route_path).observe(stats.db_seconds)
+
+
+def install(app, engine):
+    """
+    Enable metrics collection for the application, unless METRICS_ENABLED=0.
+
+    Args:
+        app (FastAPI): Application to instrument.
+        engine (Engine): Database engine used by the application.
+    """
+    if not METRICS_ENABLED:
+        return
+    instrument_engine(engine)
+    app.add_middleware(MetricsMiddleware)
+
+
+def metrics_response():
+    """
+    Render all metrics in the Prometheus text format.
+
+    Under gunicorn, PROMETHEUS_MULTIPROC_DIR must point to a directory shared by the
+    workers; the metrics of all of them are then aggregated on every scrape.
+
+    Returns:
+        Response: Prometheus exposition.
+    """
+    registry = REGISTRY
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
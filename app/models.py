@@ -1,20 +1,28 @@
-from sqlalchemy import Column, Integer, String, text, TIMESTAMP, ForeignKey
+from sqlalchemy import Column, Integer, String, text, TIMESTAMP, ForeignKey, func, Float, Index, BigInteger
 from sqlalchemy.orm import relationship
 from .database import Base
 
 
 class EntityBase:
     id = Column(Integer, primary_key=True, nullable=False)
-    created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"))
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now())
 
 
 class Post(Base, EntityBase):
     __tablename__ = "posts"
+    __table_args__ = (
+        Index("ix_posts_owner_id_created_at", "owner_id", "created_at"),
+        Index("ix_posts_deleted_at", "deleted_at"),
+    )
 
     title = Column(String, nullable=False)
     content = Column(String, nullable=False)
     image = Column(String, nullable=False)
     owner_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    like_count = Column(Integer, nullable=False, server_default=text("0"))
+    comment_count = Column(Integer, nullable=False, server_default=text("0"))
+    version = Column(Integer, nullable=False, server_default=text("0"))
+    deleted_at = Column(TIMESTAMP(timezone=True))
     owner = relationship("User")
 
 
@@ -27,6 +35,8 @@ class User(Base, EntityBase):
 
 class LikePost(Base):
     __tablename__ = "like_post"
+    __table_args__ = (Index("ix_like_post_post_id", "post_id"),)
+
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True, nullable=False)
     post_id = Column(Integer, ForeignKey("posts.id", ondelete="CASCADE"), primary_key=True, nullable=False)
 
@@ -37,6 +47,7 @@ class CommentBase:
 
 class Comment(Base):
     __tablename__ = "comments"
+    __table_args__ = (Index("ix_comments_post_id", "post_id"),)
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     comment = Column(String, nullable=False)
@@ -46,6 +57,41 @@ class Comment(Base):
 
 class Images(Base):
     __tablename__ = "images"
+    __table_args__ = (
+        Index("ix_images_created_at_id", "created_at", "id"),
+        Index("ix_images_format_id", "format", "id"),
+        Index("ix_images_width_height", "width", "height"),
+        Index("ix_images_file_size", "file_size"),
+        Index("ix_images_camera_id", "camera_make", "camera_model", "id"),
+        Index("ix_images_taken_at_id", "taken_at", "id"),
+        Index("ix_images_deleted_at", "deleted_at"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     image = Column(String, nullable=False)
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now())
+    width = Column(Integer)
+    height = Column(Integer)
+    format = Column(String)
+    file_size = Column(BigInteger)
+    camera_make = Column(String)
+    camera_model = Column(String)
+    taken_at = Column(TIMESTAMP)
+    deleted_at = Column(TIMESTAMP(timezone=True))
+
+
+class PostScore(Base):
+    __tablename__ = "post_scores"
+    __table_args__ = (Index("ix_post_scores_score_post_id", "score", "post_id"),)
+
+    post_id = Column(Integer, ForeignKey("posts.id", ondelete="CASCADE"), primary_key=True, nullable=False)
+    score = Column(Float, nullable=False)
+
+
+class UserStats(Base):
+    __tablename__ = "user_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True, nullable=False)
+    post_count = Column(Integer, nullable=False, server_default=text("0"))
+    likes_received = Column(Integer, nullable=False, server_default=text("0"))
+    comment_count = Column(Integer, nullable=False, server_default=text("0"))
@@ -0,0 +1,331 @@
+import collections
+import contextvars
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import event
+from starlette.concurrency import run_in_threadpool
+
+PROFILE_ENABLED = os.getenv("PROFILE_ENABLED", "0") == "1"
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0.01))
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", 500))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", 5))
+PROFILE_BUFFER_SECONDS = float(os.getenv("PROFILE_BUFFER_SECONDS", 30))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/tmp/blog-profiles")
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", 200))
+
+SPEEDSCOPE_SUFFIX = ".speedscope.json"
+COLLAPSED_SUFFIX = ".collapsed.txt"
+SQL_SUFFIX = ".sql.json"
+
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+}
+
+logger = logging.getLogger(__name__)
+
+_profile_session = contextvars.ContextVar("profile_session", default=None)
+
+
+class ProfileSession:
+    """
+    What the profiler learns about one request while it runs.
+
+    The threads that issued SQL for the request are remembered, so samples of other
+    threads handling concurrent requests can be left out of its profile.
+    """
+
+    __slots__ = ("queries", "threads")
+
+    def __init__(self):
+        self.queries = []
+        self.threads = {threading.get_ident()}
+
+
+class StackSampler:
+    """
+    Statistical profiler sampling the stacks of all threads at a fixed interval.
+
+    Samples are kept in a ring buffer covering the last `buffer_seconds`, so a
+    request can be profiled after it turned out to be slow. Idle threads (blocked in
+    a wait, select or queue get) are not recorded.
+
+    Args:
+        interval (float): Seconds between samples.
+        buffer_seconds (float): Time span kept in the ring buffer.
+    """
+
+    def __init__(self, interval=PROFILE_INTERVAL_MS / 1000, buffer_seconds=PROFILE_BUFFER_SECONDS):
+        self.interval = interval
+        self.samples = collections.deque(maxlen=max(1, int(buffer_seconds / interval)))
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                code = frame.f_code
+                if (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                    frame = frame.f_back
+                stack.reverse()
+                self.samples.append((now, ident, tuple(stack)))
+
+    def collect(self, start, end, threads=None):
+        """
+        Return the stacks sampled between two `time.perf_counter()` values.
+
+        Args:
+            start (float): Start of the window.
+            end (float): End of the window.
+            threads (set): Thread idents to keep, or None for all threads.
+
+        Returns:
+            List[tuple]: Stacks as tuples of (function, file, line) from root to leaf.
+        """
+        return [stack for sampled_at, ident, stack in list(self.samples)
+                if start <= sampled_at <= end and (threads is None or ident in threads)]
+
+
+class ProfileStore:
+    """
+    Bounded directory of request profiles.
+
+    Every profile is written as a speedscope file, a collapsed-stack file and a
+    JSON list of the SQL statements; the oldest profiles are removed once more
+    than `max_files` are stored.
+
+    Args:
+        directory (str): Directory holding the profiles.
+        max_files (int): Number of profiles kept.
+    """
+
+    def __init__(self, directory=PROFILE_DIR, max_files=PROFILE_MAX_FILES):
+        self.directory = directory
+        self.max_files = max_files
+
+    def write(self, name, stacks, queries, duration_ms, interval_ms):
+        """
+        Store one profile and rotate the directory.
+
+        Args:
+            name (str): Title of the profile, e.g. "GET /posts/".
+            stacks (List[tuple]): Sampled stacks.
+            queries (List[tuple]): (statement, duration in ms) pairs.
+            duration_ms (float): Duration of the request.
+            interval_ms (float): Sampling interval.
+
+        Returns:
+            str: Base name of the stored profile.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        slug = "".join(char if char.isalnum() else "_" for char in name).strip("_")
+        base_name = f"{datetime.utcnow():%Y%m%dT%H%M%S%f}-{slug}-{int(duration_ms)}ms"
+        base_path = os.path.join(self.directory, base_name)
+
+        frames = []
+        frame_index = {}
+        samples = []
+        for stack in stacks:
+            sample = []
+            for frame in stack:
+                if frame not in frame_index:
+                    frame_index[frame] = len(frames)
+                    frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+                sample.append(frame_index[frame])
+            samples.append(sample)
+        speedscope = {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "blog-profiler",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": duration_ms,
+                "samples": samples,
+                "weights": [interval_ms] * len(samples),
+            }],
+        }
+        with open(base_path + SPEEDSCOPE_SUFFIX, "w") as output:
+            json.dump(speedscope, output)
+
+        collapsed = collections.Counter(
+            ";".join(f"{function} ({os.path.basename(file)}:{line})" for function, file, line in stack)
+            for stack in stacks)
+        with open(base_path + COLLAPSED_SUFFIX, "w") as output:
+            output.writelines(f"{stack} {count}\n" for stack, count in collapsed.items())
+
+        with open(base_path + SQL_SUFFIX, "w") as output:
+            json.dump([{"statement": statement, "duration_ms": round(query_ms, 3)}
+                       for statement, query_ms in queries], output, indent=2)
+
+        self.rotate()
+        return base_name
+
+    def list(self):
+        """
+        List stored profiles, newest first.
+
+        Returns:
+            List[dict]: Name, creation time and file names of every profile.
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for file_name in os.listdir(self.directory):
+            if not file_name.endswith(SPEEDSCOPE_SUFFIX):
+                continue
+            name = file_name[:-len(SPEEDSCOPE_SUFFIX)]
+            path = os.path.join(self.directory, file_name)
+            profiles.append({
+                "name": name,
+                "created_at": datetime.utcfromtimestamp(os.path.getmtime(path)),
+                "files": [name + suffix for suffix in (SPEEDSCOPE_SUFFIX, COLLAPSED_SUFFIX, SQL_SUFFIX)],
+            })
+        profiles.sort(key=lambda profile: profile["name"], reverse=True)
+        return profiles
+
+    def path(self, file_name):
+        """
+        Resolve a profile file name to its path, or None if there is no such file.
+        """
+        if os.path.basename(file_name) != file_name:
+            return None
+        path = os.path.join(self.directory, file_name)
+        if not file_name.endswith((SPEEDSCOPE_SUFFIX, COLLAPSED_SUFFIX, SQL_SUFFIX)) or not os.path.isfile(path):
+            return None
+        return path
+
+    def rotate(self):
+        for profile in self.list()[self.max_files:]:
+            for file_name in profile["files"]:
+                try:
+                    os.remove(os.path.join(self.directory, file_name))
+                except FileNotFoundError:
+                    pass
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _profile_session.get() is not None:
+        context._profile_query_start_time = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    session = _profile_session.get()
+    start = getattr(context, "_profile_query_start_time", None)
+    if session is None or start is None:
+        return
+    session.queries.append((statement, (time.perf_counter() - start) * 1000))
+    session.threads.add(threading.get_ident())
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware profiling a sample of requests and every slow request.
+
+    The stack sampler runs continuously while profiling is enabled. When a request
+    ends, it is kept if it took at least `slow_ms` or was picked with probability
+    `sample_rate`; its stacks are then taken from the sampler's ring buffer and
+    written, together with the SQL it issued, to the profile store. A request is
+    timed until its response starts, so streamed responses such as event streams
+    and exports are not slow just because the client keeps them open.
+    """
+
+    def __init__(self, app, sampler, store, sample_rate=PROFILE_SAMPLE_RATE, slow_ms=PROFILE_SLOW_MS):
+        self.app = app
+        self.sampler = sampler
+        self.store = store
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        session = ProfileSession()
+        token = _profile_session.set(session)
+        start = time.perf_counter()
+        response_started = None
+
+        async def send_timed(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = time.perf_counter()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_timed)
+        finally:
+            end = response_started or time.perf_counter()
+            _profile_session.reset(token)
+            duration_ms = (end - start) * 1000
+            if duration_ms >= self.slow_ms or random.random() < self.sample_rate:
+                await self._save(scope, session, start, end, duration_ms)
+
+    async def _save(self, scope, session, start, end, duration_ms):
+        route = scope.get("route")
+        name = f"{scope['method']} {route.path if route is not None else scope['path']}"
+        for statement, query_ms in session.queries:
+            logger.info("%s: %.3f ms %s", name, query_ms, statement)
+        threads = session.threads if len(session.threads) > 1 else None
+        stacks = self.sampler.collect(start, end, threads)
+        try:
+            await run_in_threadpool(self.store.write, name, stacks, session.queries, duration_ms,
+                                    self.sampler.interval * 1000)
+        except OSError:
+            logger.exception("Failed to store profile of %s", name)
+
+
+profile_store = ProfileStore()
+
+
+def install(app, engine):
+    """
+    Enable request profiling for the application when PROFILE_ENABLED=1.
+
+    Nothing is registered otherwise, so a disabled profiler costs nothing per request.
+
+    Args:
+        app (FastAPI): Application to profile.
+        engine (Engine): Database engine whose statements are logged.
+    """
+    if not PROFILE_ENABLED:
+        return
+    sampler = StackSampler()
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    app.add_middleware(ProfilingMiddleware, sampler=sampler, store=profile_store)
+    app.add_event_handler("startup", sampler.start)
+    app.add_event_handler("shutdown", sampler.stop)
@@ -0,0 +1,179 @@
+"""
+Trending ("hot") ranking of posts.
+
+    python -m app.ranking refresh
+
+Scores are stored in `post_scores` and kept current by the write paths; the
+refresh command recomputes all of them, e.g. after a bulk import or from cron.
+It first recounts the like and comment counters of the posts from `like_post`
+and `comments`, which also fills them for posts created before the counters
+existed.
+"""
+import argparse
+import math
+import os
+from datetime import datetime, timezone
+
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.orm import joinedload
+
+from app import models
+from app.database import SessionLocal, dialect_insert
+
+TRENDING_DECAY_SECONDS = float(os.getenv("TRENDING_DECAY_SECONDS", 45000))
+TRENDING_COMMENT_WEIGHT = float(os.getenv("TRENDING_COMMENT_WEIGHT", 2))
+TRENDING_REFRESH_BATCH = 5000
+TRENDING_EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc).timestamp()
+
+
+def hot_score(likes, comments, created_at):
+    """
+    Time-decayed popularity score of a post.
+
+    Popularity counts logarithmically and every TRENDING_DECAY_SECONDS of age is
+    worth one order of magnitude of it. Age is measured from a fixed epoch instead
+    of from now, so the order of two scores never changes as time passes and a
+    score only has to be recomputed when the post gets a like or a comment.
+
+    Args:
+        likes (int): Like count.
+        comments (int): Comment count.
+        created_at (datetime): Creation time of the post.
+
+    Returns:
+        float: Score; higher is hotter.
+    """
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    popularity = max(likes + TRENDING_COMMENT_WEIGHT * comments, 0)
+    return math.log10(1 + popularity) + (created_at.timestamp() - TRENDING_EPOCH) / TRENDING_DECAY_SECONDS
+
+
+def upsert_scores(db, rows):
+    """
+    Compute and store the scores of posts.
+
+    Args:
+        db (Database): Database session; the caller commits.
+        rows: Iterable of (post id, like count, comment count, created_at).
+    """
+    values = [{"post_id": post_id, "score": hot_score(likes, comments, created_at)}
+              for post_id, likes, comments, created_at in rows]
+    if not values:
+        return
+    insert = dialect_insert(db)
+    statement = insert(models.PostScore).values(values)
+    statement = statement.on_conflict_do_update(index_elements=[models.PostScore.post_id],
+                                                set_={"score": statement.excluded.score})
+    db.execute(statement)
+
+
+def rescore_posts(db, post_ids):
+    """
+    Recompute the scores of some posts from their counters.
+
+    Args:
+        db (Database): Database session; the caller commits.
+        post_ids: IDs of the posts that got a like, unlike or comment.
+    """
+    post_ids = list(post_ids)
+    if not post_ids:
+        return
+    rows = db.execute(select(models.Post.id, models.Post.like_count, models.Post.comment_count,
+                             models.Post.created_at)
+                      .where(models.Post.id.in_(post_ids), models.Post.deleted_at.is_(None))).all()
+    upsert_scores(db, rows)
+
+
+def recount_counters(db, first_id, last_id):
+    """
+    Set the like and comment counters of a range of posts to their number of rows
+    in like_post and comments.
+
+    Counters that are already right are not written. Like deltas still buffered by
+    the like counter of a worker are added at its next flush, so posts liked while
+    the recount runs may end up off by the likes of that last interval.
+
+    Args:
+        db (Database): Database session; the caller commits.
+        first_id: ID of the first post of the range.
+        last_id: ID of the last post of the range.
+    """
+    posts = models.Post.__table__
+    likes = select(func.count()).select_from(models.LikePost.__table__) \
+        .where(models.LikePost.__table__.c.post_id == posts.c.id).scalar_subquery()
+    comments = select(func.count()).select_from(models.Comment.__table__) \
+        .where(models.Comment.__table__.c.post_id == posts.c.id).scalar_subquery()
+    db.execute(update(posts).where(posts.c.id.between(first_id, last_id),
+                                   or_(posts.c.like_count.is_distinct_from(likes),
+                                       posts.c.comment_count.is_distinct_from(comments)))
+               .values(like_count=likes, comment_count=comments))
+
+
+def refresh_scores(db, batch_size=TRENDING_REFRESH_BATCH):
+    """
+    Recount the likes and comments and recompute the score of every post, one
+    batch per transaction.
+
+    Args:
+        db (Database): Database session.
+        batch_size (int): Posts per batch.
+
+    Returns:
+        int: Number of posts scored.
+    """
+    scored = 0
+    last_id = 0
+    while True:
+        post_ids = db.scalars(select(models.Post.id)
+                              .where(models.Post.id > last_id, models.Post.deleted_at.is_(None))
+                              .order_by(models.Post.id).limit(batch_size)).all()
+        if not post_ids:
+            return scored
+        recount_counters(db, post_ids[0], post_ids[-1])
+        rescore_posts(db, post_ids)
+        db.commit()
+        scored += len(post_ids)
+        last_id = post_ids[-1]
+
+
+def get_trending_posts(db, limit, after_score=None, after_id=None):
+    """
+    Get a page of posts ordered from hottest to coldest.
+
+    Pages are addressed by the score and id of the last post of the previous page,
+    so every page is a range scan of the (score, post_id) index regardless of depth.
+
+    Args:
+        db (Database): Database session.
+        limit (int): Page size.
+        after_score (float): Score of the last post of the previous page.
+        after_id (int): ID of the last post of the previous page.
+
+    Returns:
+        List[tuple]: (Post, score) pairs.
+    """
+    query = db.query(models.Post, models.PostScore.score) \
+        .join(models.PostScore, models.PostScore.post_id == models.Post.id) \
+        .options(joinedload(models.Post.owner))
+    if after_score is not None and after_id is not None:
+        query = query.filter(or_(models.PostScore.score < after_score,
+                                 and_(models.PostScore.score == after_score, models.PostScore.post_id < after_id)))
+    return query.order_by(models.PostScore.score.desc(), models.PostScore.post_id.desc()).limit(limit).all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the trending ranking of posts.")
+    parser.add_argument("command", choices=["refresh"])
+    parser.add_argument("--batch-size", type=int, default=TRENDING_REFRESH_BATCH)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        print(f"Scored {refresh_scores(db, args.batch_size)} posts")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
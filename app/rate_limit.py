@@ -0,0 +1,250 @@
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from starlette import status
+from starlette.responses import JSONResponse
+
+from app.cache import CACHE_REDIS_URL, FakeRedis
+from app.metrics import REQUESTS_SHED
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", CACHE_REDIS_URL)
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", 100000))
+IMAGE_RATE = float(os.getenv("RATE_LIMIT_IMAGE_RATE", 2))
+IMAGE_BURST = int(os.getenv("RATE_LIMIT_IMAGE_BURST", 10))
+IMAGE_CONCURRENCY = int(os.getenv("RATE_LIMIT_IMAGE_CONCURRENCY", os.cpu_count() or 1))
+AUTH_RATE = float(os.getenv("RATE_LIMIT_AUTH_RATE", 1))
+AUTH_BURST = int(os.getenv("RATE_LIMIT_AUTH_BURST", 5))
+AUTH_CONCURRENCY = int(os.getenv("RATE_LIMIT_AUTH_CONCURRENCY", 2 * (os.cpu_count() or 1)))
+BULK_RATE = float(os.getenv("RATE_LIMIT_BULK_RATE", 0.1))
+BULK_BURST = int(os.getenv("RATE_LIMIT_BULK_BURST", 2))
+BULK_CONCURRENCY = int(os.getenv("RATE_LIMIT_BULK_CONCURRENCY", 1))
+BULK_LIKE_RATE = float(os.getenv("RATE_LIMIT_BULK_LIKE_RATE", 5))
+BULK_LIKE_BURST = int(os.getenv("RATE_LIMIT_BULK_LIKE_BURST", 20))
+
+
+class MemoryBucketStore:
+    """
+    Token buckets kept in the memory of the worker.
+
+    Every key owns a bucket of `burst` tokens refilled at `rate` tokens per second.
+    Buckets are evicted least recently used once more than `max_keys` exist, which
+    bounds memory when many clients come and go. Under `gunicorn -w N` every worker
+    has its own buckets, so a client gets up to N times the configured rate.
+
+    Args:
+        max_keys (int): Number of buckets kept.
+        clock: Function returning the current time in seconds.
+    """
+
+    def __init__(self, max_keys=RATE_LIMIT_MAX_KEYS, clock=time.monotonic):
+        self.max_keys = max_keys
+        self.clock = clock
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst):
+        """
+        Take one token from the bucket of a key.
+
+        Args:
+            key (str): Bucket key, e.g. "image:user:1".
+            rate (float): Tokens added per second.
+            burst (int): Capacity of the bucket.
+
+        Returns:
+            tuple: (allowed, seconds until a token is available).
+        """
+        now = self.clock()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated_at) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (1 - tokens) / rate
+
+
+class SharedBucketStore:
+    """
+    Rate limits shared by all workers, stored in Redis.
+
+    A token bucket needs a read-modify-write of two values, which plain Redis
+    commands cannot do atomically, so it is approximated with a counter per fixed
+    window of `burst / rate` seconds: every window admits `burst` requests. Counters
+    expire together with their window.
+
+    Args:
+        client: Redis client, or any object implementing `incr` and `expire`
+            (see FakeRedis).
+        clock: Function returning the current time in seconds.
+    """
+
+    def __init__(self, client, clock=time.time):
+        self.client = client
+        self.clock = clock
+
+    def take(self, key, rate, burst):
+        window = burst / rate
+        now = self.clock()
+        window_key = f"rl:{key}:{int(now // window)}"
+        count = int(self.client.incr(window_key))
+        if count == 1:
+            self.client.expire(window_key, math.ceil(window) + 1)
+        if count <= burst:
+            return True, 0.0
+        return False, window - now % window
+
+
+class Policy:
+    """
+    Admission rules of a group of routes.
+
+    Args:
+        name (str): Name used in bucket keys and metrics.
+        methods (set): HTTP methods the policy applies to.
+        pattern (str): Regular expression matched against the whole request path.
+        rate (float): Requests per second allowed per client.
+        burst (int): Requests a client may make at once before being limited.
+        concurrency (int): Requests of the group handled at the same time by the
+            worker; 0 for no limit.
+    """
+
+    def __init__(self, name, methods, pattern, rate, burst, concurrency=0):
+        self.name = name
+        self.methods = methods
+        self.pattern = re.compile(pattern)
+        self.rate = rate
+        self.burst = burst
+        self.concurrency = concurrency
+        self.in_flight = 0
+
+    def matches(self, method, path):
+        return method in self.methods and self.pattern.fullmatch(path) is not None
+
+
+POLICIES = [
+    Policy("image", {"POST"}, r"/(update_size|update_color|update_image_detail|remove_image_detail)/\d+"
+                              r"|/upload_image/", IMAGE_RATE, IMAGE_BURST, IMAGE_CONCURRENCY),
+    Policy("auth", {"POST"}, r"/login/?|/users/", AUTH_RATE, AUTH_BURST, AUTH_CONCURRENCY),
+    # admin imports and exports; one at a time per worker
+    Policy("bulk", {"GET", "POST"}, r"/(users|posts)/bulk/|/export/(posts|comments|images)", BULK_RATE, BULK_BURST,
+           BULK_CONCURRENCY),
+    # interactive traffic of every user, limited per user only
+    Policy("bulk_like", {"POST"}, r"/like_post/bulk/", BULK_LIKE_RATE, BULK_LIKE_BURST),
+]
+
+
+def client_key(scope):
+    """
+    Identify the client of a request: the user of a valid bearer token, otherwise
+    the client address.
+    """
+    from app.token import get_token_user_id
+
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, credentials = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer":
+                user_id = get_token_user_id(credentials)
+                if user_id is not None:
+                    return f"user:{user_id}"
+            break
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware limiting the rate and concurrency of expensive routes.
+
+    Requests are rejected before the endpoint runs and before their body is read:
+    with 503 when the route group already has `concurrency` requests in flight in
+    this worker, and with 429 when the client ran out of tokens. Both responses
+    carry a Retry-After header. Requests to routes without a policy pass through
+    untouched, so cheap endpoints keep their threadpool capacity while expensive
+    ones are abused.
+
+    The in-flight counters are only touched from the event loop and need no lock.
+    A shared store is called from the event loop too; Redis round trips are short
+    enough for that, while moving them to the threadpool would compete with the
+    work being protected.
+    """
+
+    def __init__(self, app, store, policies=POLICIES):
+        self.app = app
+        self.store = store
+        self.policies = policies
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        policy = next((policy for policy in self.policies if policy.matches(scope["method"], scope["path"])), None)
+        if policy is None:
+            await self.app(scope, receive, send)
+            return
+
+        if policy.concurrency and policy.in_flight >= policy.concurrency:
+            await self._shed(scope, receive, send, policy, "concurrency", status.HTTP_503_SERVICE_UNAVAILABLE, 1)
+            return
+        allowed, retry_after = self.store.take(f"{policy.name}:{client_key(scope)}", policy.rate, policy.burst)
+        if not allowed:
+            await self._shed(scope, receive, send, policy, "rate", status.HTTP_429_TOO_MANY_REQUESTS, retry_after)
+            return
+
+        policy.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            policy.in_flight -= 1
+
+    @staticmethod
+    async def _shed(scope, receive, send, policy, reason, status_code, retry_after):
+        REQUESTS_SHED.labels(policy.name, reason).inc()
+        detail = "Too many requests" if reason == "rate" else "Server busy"
+        response = JSONResponse({"detail": detail}, status_code=status_code,
+                                headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+        await response(scope, receive, send)
+
+
+def create_store(name=RATE_LIMIT_BACKEND):
+    """
+    Build the bucket store selected by RATE_LIMIT_BACKEND.
+
+    Args:
+        name (str): "memory", "redis" or "fake-redis".
+
+    Returns:
+        MemoryBucketStore or SharedBucketStore.
+    """
+    if name == "memory":
+        return MemoryBucketStore()
+    if name == "fake-redis":
+        return SharedBucketStore(FakeRedis())
+    if name == "redis":
+        import redis
+
+        return SharedBucketStore(redis.Redis.from_url(RATE_LIMIT_REDIS_URL))
+    raise ValueError(f"Unknown rate limit backend: {name}")
+
+
+def install(app):
+    """
+    Enable admission control for the application, unless RATE_LIMIT_ENABLED=0.
+
+    Args:
+        app (FastAPI): Application to protect.
+    """
+    if not RATE_LIMIT_ENABLED:
+        return
+    app.add_middleware(AdmissionMiddleware, store=create_store())
@@ -0,0 +1,259 @@
+"""
+Background purge of soft-deleted posts and images.
+
+    python -m app.reaper [--once]
+
+Deleting a post or an image only sets its `deleted_at` column. The reaper then
+removes the likes and comments of deleted posts a batch per transaction, so no
+statement holds locks on a popular post for long, followed by the post rows; for
+deleted images it removes the file and then the row. Only files under IMAGE_ROOT
+that no other image refers to are removed, and deleted images are kept until
+IMAGE_ROOT is set, so their files can still be found. It runs in a thread of
+every worker, and as a standalone process with this command.
+"""
+import argparse
+import logging
+import os
+import threading
+import time
+from collections import Counter
+
+from sqlalchemy import delete, exists, func, select
+from sqlalchemy.orm import aliased
+
+from app import models
+from app.database import SessionLocal
+from app.metrics import REAPER_BACKLOG, REAPER_FILES_REMOVED, REAPER_ROWS_PURGED
+from app.user_stats import change_user_stats
+
+REAPER_ENABLED = os.getenv("REAPER_ENABLED", "1") == "1"
+REAPER_INTERVAL = float(os.getenv("REAPER_INTERVAL", 5.0))
+REAPER_BATCH = int(os.getenv("REAPER_BATCH", 500))
+# directory holding the uploaded image files; deleted images are not purged when unset
+IMAGE_ROOT = os.getenv("IMAGE_ROOT")
+
+logger = logging.getLogger(__name__)
+
+
+def purge_post(db, post_id, batch_size=REAPER_BATCH):
+    """
+    Remove a deleted post with its likes and comments, one batch per transaction.
+
+    The like counters of the owner were adjusted when the post was deleted; the
+    authors of the comments lose them here, as the comments are removed. Removed
+    comments are counted from the rows the DELETE returns, so two reapers working
+    on the same post never decrement a counter twice.
+
+    Args:
+        db (Database): Database session.
+        post_id: ID of the deleted post.
+        batch_size (int): Rows deleted per statement.
+    """
+    likes = models.LikePost.__table__
+    while True:
+        batch = select(likes.c.user_id).where(likes.c.post_id == post_id).limit(batch_size)
+        deleted = db.execute(delete(likes).where(likes.c.post_id == post_id, likes.c.user_id.in_(batch))).rowcount
+        db.commit()
+        REAPER_ROWS_PURGED.labels("like_post").inc(deleted)
+        if deleted < batch_size:
+            break
+
+    comments = models.Comment.__table__
+    while True:
+        batch = select(comments.c.id).where(comments.c.post_id == post_id).limit(batch_size)
+        authors = db.execute(delete(comments).where(comments.c.id.in_(batch))
+                             .returning(comments.c.user_id)).scalars().all()
+        for user_id, count in Counter(authors).items():
+            change_user_stats(db, user_id, comment_count=-count)
+        db.commit()
+        REAPER_ROWS_PURGED.labels("comments").inc(len(authors))
+        if len(authors) < batch_size:
+            break
+
+    db.execute(delete(models.PostScore).where(models.PostScore.post_id == post_id))
+    deleted = db.execute(delete(models.Post).where(models.Post.id == post_id, models.Post.deleted_at.is_not(None)))
+    db.commit()
+    REAPER_ROWS_PURGED.labels("posts").inc(deleted.rowcount)
+
+
+def reap_posts(db, batch_size=REAPER_BATCH):
+    """
+    Purge up to `batch_size` deleted posts, oldest deletion first.
+
+    Returns:
+        int: Number of posts purged.
+    """
+    post_ids = db.scalars(select(models.Post.id).where(models.Post.deleted_at.is_not(None))
+                          .order_by(models.Post.deleted_at).limit(batch_size)).all()
+    for post_id in post_ids:
+        purge_post(db, post_id, batch_size)
+    return len(post_ids)
+
+
+def inside_image_root(path, root=IMAGE_ROOT):
+    """
+    Tell whether a stored image path resolves to a file under the image root.
+
+    Image paths are supplied by clients, so the reaper must not remove a file
+    anywhere else, whatever `..` components or symbolic links the path contains.
+
+    Args:
+        path (str): Stored path of the image.
+        root (str): Image root directory.
+
+    Returns:
+        bool: True if the path resolves below the root.
+    """
+    root = os.path.realpath(root)
+    resolved = os.path.realpath(path)
+    return resolved != root and os.path.commonpath([root, resolved]) == root
+
+
+def reap_images(db, batch_size=REAPER_BATCH, root=IMAGE_ROOT):
+    """
+    Remove the files and rows of up to `batch_size` deleted images.
+
+    A file is only removed if it lies under `root` and no image that is not deleted
+    refers to the same path; otherwise only the row is dropped. The file is
+    removed before the row, so a crash in between leaves a row that the next run
+    retries rather than a file nothing refers to. Without a root nothing is purged:
+    dropping the rows would lose the only record of the files to remove.
+
+    Returns:
+        int: Number of images purged; images whose file could not be removed are
+            left for the next run.
+    """
+    if not root:
+        if db.scalar(select(models.Images.id).where(models.Images.deleted_at.is_not(None)).limit(1)) is not None:
+            logger.warning("IMAGE_ROOT is not set; deleted images are kept until it is")
+        return 0
+    live = aliased(models.Images)
+    referenced = exists().where(live.image == models.Images.image, live.deleted_at.is_(None))
+    rows = db.execute(select(models.Images.id, models.Images.image, referenced)
+                      .where(models.Images.deleted_at.is_not(None))
+                      .order_by(models.Images.deleted_at).limit(batch_size)).all()
+    purged = 0
+    for image_id, path, in_use in rows:
+        if not in_use and inside_image_root(path, root):
+            try:
+                os.remove(path)
+                REAPER_FILES_REMOVED.inc()
+            except FileNotFoundError:
+                pass
+            except OSError:
+                logger.exception("Failed to remove image file %s", path)
+                continue
+        db.execute(delete(models.Images).where(models.Images.id == image_id))
+        db.commit()
+        REAPER_ROWS_PURGED.labels("images").inc()
+        purged += 1
+    return purged
+
+
+def update_backlog(db):
+    for entity, table in (("posts", models.Post), ("images", models.Images)):
+        REAPER_BACKLOG.labels(entity).set(db.scalar(select(func.count()).select_from(table)
+                                                    .where(table.deleted_at.is_not(None))))
+
+
+def reap(session_factory=SessionLocal, batch_size=REAPER_BATCH):
+    """
+    Purge deleted posts and images until none are left.
+
+    Args:
+        session_factory: Callable returning a new database session.
+        batch_size (int): Rows deleted per statement and entities per round.
+
+    Returns:
+        dict: Number of posts and images purged.
+    """
+    purged = {"posts": 0, "images": 0}
+    db = session_factory()
+    try:
+        while True:
+            posts = reap_posts(db, batch_size)
+            images = reap_images(db, batch_size)
+            purged["posts"] += posts
+            purged["images"] += images
+            if posts < batch_size and images < batch_size:
+                break
+        update_backlog(db)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    return purged
+
+
+class Reaper:
+    """
+    Thread running `reap` every `interval` seconds.
+
+    Args:
+        session_factory: Callable returning a new database session.
+        interval (float): Seconds between runs.
+        batch_size (int): Rows deleted per statement.
+    """
+
+    def __init__(self, session_factory=SessionLocal, interval=REAPER_INTERVAL, batch_size=REAPER_BATCH):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.batch_size = batch_size
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="reaper", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                reap(self.session_factory, self.batch_size)
+            except Exception:
+                logger.exception("Failed to purge deleted rows")
+
+
+reaper = Reaper()
+
+
+def install(app):
+    """
+    Run the reaper in the background of the application when REAPER_ENABLED=1.
+    """
+    if not REAPER_ENABLED:
+        return
+    app.add_event_handler("startup", reaper.start)
+    app.add_event_handler("shutdown", reaper.stop)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Purge soft-deleted posts and images.")
+    parser.add_argument("--once", action="store_true", help="Purge what is deleted now and exit.")
+    parser.add_argument("--interval", type=float, default=REAPER_INTERVAL)
+    parser.add_argument("--batch-size", type=int, default=REAPER_BATCH)
+    args = parser.parse_args()
+
+    if args.once:
+        purged = reap(batch_size=args.batch_size)
+        print(f"Purged {purged['posts']} posts and {purged['images']} images")
+        return
+    while True:
+        try:
+            reap(batch_size=args.batch_size)
+        except Exception:
+            logger.exception("Failed to purge deleted rows")
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,32 @@
-from fastapi import APIRouter, Depends, Response, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy import func
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from datetime import datetime
+from typing import List, Literal, Optional
 
 from .crud_blog import create_new_user, check_if_user_exists, login_user, create_new_post, get_post, get_all_posts, \
-    update_post, delete_post_data, create_new_comment, delete_comment_data, like_post_func
+    update_post, delete_post_data, create_new_comment, delete_comment_data, like_post_func, like_post_batched, \
+    bulk_like_posts, select_post_rows, check_if_exists
 from .crud_image_analyze import create_new_image, delete_image_data, image_detail_data, update_tag_data, \
     remove_tag_data, update_color, update_size
 from .models import User
 from . import models, schemas, token
+from .bulk_import import BULK_BATCH_SIZE, import_stream
+from .cache import response_cache
 from .database import get_db
+from .events import event_stream_response
+from .export import export_response
+from .image_catalog import list_images
+from .http_cache import conditional_response, file_etag, post_etag, post_list_etag
+from .fast_json import posts_response, stream_posts_response
+from .like_counter import LIKE_WRITE_MODE
+from .metrics import metrics_response
+from .profiling import profile_store
+from .ranking import get_trending_posts
+from .user_stats import get_user_posts, get_user_stats
 
 router = APIRouter()
 
@@ -21,9 +37,25 @@ router = APIRouter()
 @router.get("/users/{user_id}", response_model=schemas.User)
 def get_user(user_id: int, db: Session = Depends(get_db)):
     # get user data
-    user = db.query(models.User).filter(models.User.id == user_id).first()
-    check_if_user_exists(user, user_id)
-    return user
+    def load_user():
+        user = db.query(models.User).filter(models.User.id == user_id).first()
+        check_if_user_exists(user, user_id)
+        return jsonable_encoder(schemas.User.model_validate(user, from_attributes=True))
+
+    return response_cache.get_or_set("user", user_id, load_user)
+
+
+@router.get("/users/{user_id}/stats", response_model=schemas.UserStats)
+def user_stats(user_id: int, db: Session = Depends(get_db)):
+    return get_user_stats(db, user_id)
+
+
+@router.get("/users/{user_id}/posts", response_model=List[schemas.PostOut])
+def user_posts(user_id: int, limit: int = Query(20, ge=1, le=100), before_created_at: Optional[datetime] = None,
+               before_id: Optional[int] = None, db: Session = Depends(get_db)):
+    posts = get_user_posts(db, user_id, limit, before_created_at, before_id)
+    return [schemas.PostOut(Post=schemas.Post.model_validate(post, from_attributes=True), likes=post.like_count)
+            for post in posts]
 
 
 @router.post("/users/", status_code=status.HTTP_201_CREATED, response_model=schemas.User)
@@ -33,6 +65,13 @@ def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
     return new_user
 
 
+@router.post("/users/bulk/", response_model=schemas.BulkImportResult)
+async def import_users(request: Request, batch_size: int = BULK_BATCH_SIZE,
+                       current_user: User = Depends(token.get_current_admin)):
+    # NDJSON body, one UserCreate per line
+    return await import_stream("users", request.stream(), batch_size)
+
+
 @router.post("/login/", response_model=schemas.Token)
 def login(user_credentials: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     access_token = login_user(user_credentials, db)
@@ -40,15 +79,60 @@ def login(user_credentials: OAuth2PasswordRequestForm = Depends(), db: Session =
 
 
 @router.get("/posts/", response_model=List[schemas.PostOut])
-def get_posts(search: Optional[str] = "", db: Session = Depends(get_db)):
-    results = get_all_posts(db, func, search)
-    return results
+def get_posts(request: Request, response: Response, search: Optional[str] = "", db: Session = Depends(get_db)):
+    def load_posts():
+        results = get_all_posts(db, func, search)
+        return {
+            "etag": post_list_etag((result.Post.id, result.Post.version, result.likes) for result in results),
+            "body": jsonable_encoder([schemas.PostOut.model_validate(result, from_attributes=True)
+                                      for result in results]),
+        }
+
+    posts = response_cache.get_or_set("posts", None, load_posts, search=search)
+    return conditional_response(request, response, posts["etag"]) or posts["body"]
+
+
+@router.get("/posts/fast/", response_model=List[schemas.PostOut])
+def get_posts_fast(search: Optional[str] = "", stream: bool = False, db: Session = Depends(get_db)):
+    statement = select_post_rows(search)
+    if stream:
+        return stream_posts_response(statement)
+    return posts_response(db, statement)
+
+
+@router.get("/posts/trending/", response_model=List[schemas.TrendingPost])
+def get_trending(limit: int = Query(20, ge=1, le=100), after_score: Optional[float] = None,
+                 after_id: Optional[int] = None, db: Session = Depends(get_db)):
+    def load_trending():
+        results = get_trending_posts(db, limit, after_score, after_id)
+        return jsonable_encoder([schemas.TrendingPost(Post=schemas.Post.model_validate(post, from_attributes=True),
+                                                      likes=post.like_count, score=score)
+                                 for post, score in results])
+
+    # scores change with every like, so trending pages expire by TTL instead of being bumped
+    return response_cache.get_or_set("trending", None, load_trending, limit=limit, after_score=after_score,
+                                     after_id=after_id)
 
 
 @router.get("/posts/{post_id}", response_model=schemas.PostOut)
-def find_post(post_id: int, db: Session = Depends(get_db)):
-    post = get_post(post_id, db, func)
-    return post
+def find_post(post_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
+    def load_post():
+        post = get_post(post_id, db, func)
+        return {
+            "etag": post_etag(post_id, post.Post.version, post.likes),
+            "body": jsonable_encoder(schemas.PostOut.model_validate(post, from_attributes=True)),
+        }
+
+    post = response_cache.get_or_set("post", post_id, load_post)
+    return conditional_response(request, response, post["etag"]) or post["body"]
+
+
+@router.get("/posts/{post_id}/events")
+def post_events_stream(post_id: int, db: Session = Depends(get_db)):
+    # likes, unlikes and new comments of the post as server-sent events
+    check_if_exists(db.query(models.Post.id).filter(models.Post.id == post_id, models.Post.deleted_at.is_(None))
+                    .first(), post_id)
+    return event_stream_response(post_id)
 
 
 @router.post("/posts/", status_code=status.HTTP_201_CREATED, response_model=schemas.Post)
@@ -58,6 +142,13 @@ def create_post(post: schemas.PostCreate, db: Session = Depends(get_db),
     return new_post
 
 
+@router.post("/posts/bulk/", response_model=schemas.BulkImportResult)
+async def import_posts(request: Request, batch_size: int = BULK_BATCH_SIZE,
+                       current_user: User = Depends(token.get_current_admin)):
+    # NDJSON body, one PostImport per line
+    return await import_stream("posts", request.stream(), batch_size)
+
+
 @router.put("/posts/{post_id}", response_model=schemas.Post)
 def update_post_data(post_id: int, post: schemas.PostCreate, db: Session = Depends(get_db),
                      current_user: User = Depends(token.get_current_user)):
@@ -77,10 +168,19 @@ def delete_post(post_id: int, db: Session = Depends(get_db),
 @router.post("/like_post/", status_code=status.HTTP_201_CREATED)
 def like_post_by_id(like_pos_data: schemas.LikePost, db: Session = Depends(get_db),
                     current_user: User = Depends(token.get_current_user)):
+    if LIKE_WRITE_MODE == "batched":
+        return like_post_batched(db, current_user, like_pos_data)
     result = like_post_func(db, current_user, like_pos_data)
     return result
 
 
+@router.post("/like_post/bulk/", response_model=List[schemas.LikeStatus])
+def like_posts_bulk(like_posts_data: schemas.LikePostBatch, db: Session = Depends(get_db),
+                    current_user: User = Depends(token.get_current_user)):
+    result = bulk_like_posts(db, current_user, like_posts_data)
+    return result
+
+
 @router.post("/new_comment/", status_code=status.HTTP_201_CREATED, response_model=schemas.Comment)
 def create_comment(comment: schemas.CommentCreate, db: Session = Depends(get_db),
                    current_user: User = Depends(token.get_current_user)):
@@ -98,6 +198,20 @@ def delete_comment(comment_id: int, db: Session = Depends(get_db),
 
 # ImageAnalyze
 
+@router.get("/images/", response_model=List[schemas.ImageSummary])
+def get_images(limit: int = Query(50, ge=1, le=500), sort: Literal["uploaded", "taken"] = "uploaded",
+               before_id: Optional[int] = None, before_taken_at: Optional[datetime] = None,
+               format: Optional[str] = None, min_width: Optional[int] = None, max_width: Optional[int] = None,
+               min_height: Optional[int] = None, max_height: Optional[int] = None, min_size: Optional[int] = None,
+               max_size: Optional[int] = None, uploaded_after: Optional[datetime] = None,
+               uploaded_before: Optional[datetime] = None, camera_make: Optional[str] = None,
+               camera_model: Optional[str] = None, taken_after: Optional[datetime] = None,
+               taken_before: Optional[datetime] = None, db: Session = Depends(get_db)):
+    return list_images(db, limit, sort, before_id, before_taken_at, format, min_width, max_width, min_height,
+                       max_height, min_size, max_size, uploaded_after, uploaded_before, camera_make, camera_model,
+                       taken_after, taken_before)
+
+
 @router.post("/upload_image/", status_code=status.HTTP_201_CREATED, response_model=schemas.Images)
 def create_image(image: schemas.ImageCreate, db: Session = Depends(get_db)):
     new_image = create_new_image(image, db)
@@ -105,9 +219,15 @@ def create_image(image: schemas.ImageCreate, db: Session = Depends(get_db)):
 
 
 @router.get("/image_detail/{image_id}")
-def image_detail(image_id: int, db: Session = Depends(get_db)):
-    result = image_detail_data(db, image_id)
-    return result
+def image_detail(image_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
+    def load_image_detail():
+        detail = image_detail_data(db, image_id)
+        path = db.query(models.Images.image) \
+            .filter(models.Images.id == image_id, models.Images.deleted_at.is_(None)).scalar()
+        return {"etag": file_etag("image", image_id, path), "body": detail}
+
+    result = response_cache.get_or_set("image", image_id, load_image_detail)
+    return conditional_response(request, response, result["etag"]) or result["body"]
 
 
 @router.delete("/delete_image/{image_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -143,3 +263,46 @@ def remove_tag(image_id: int, tag: schemas.Tags, db: Session = Depends(get_db)):
     result = remove_tag_data(image_id, tag, db)
     if result:
         return Response(status_code=status.HTTP_200_OK)
+
+
+# Export
+
+@router.get("/export/posts")
+def export_posts(format: Literal["ndjson", "csv"] = "ndjson", since: Optional[datetime] = None,
+                 until: Optional[datetime] = None, owner_id: Optional[int] = None,
+                 current_user: User = Depends(token.get_current_admin)):
+    return export_response("posts", format, since, until, owner_id)
+
+
+@router.get("/export/comments")
+def export_comments(format: Literal["ndjson", "csv"] = "ndjson", owner_id: Optional[int] = None,
+                    current_user: User = Depends(token.get_current_admin)):
+    return export_response("comments", format, owner_id=owner_id)
+
+
+@router.get("/export/images")
+def export_images(format: Literal["ndjson", "csv"] = "ndjson", current_user: User = Depends(token.get_current_admin)):
+    return export_response("images", format)
+
+
+# Metrics
+
+@router.get("/metrics", include_in_schema=False)
+def get_metrics():
+    return metrics_response()
+
+
+# Admin
+
+@router.get("/admin/profiles", response_model=List[schemas.Profile])
+def list_profiles(current_user: User = Depends(token.get_current_admin)):
+    return profile_store.list()
+
+
+@router.get("/admin/profiles/{file_name}")
+def download_profile(file_name: str, current_user: User = Depends(token.get_current_admin)):
+    path = profile_store.path(file_name)
+    if path is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail=f"Profile file {file_name} was not found")
+    return FileResponse(path, filename=file_name)
@@ -1,7 +1,10 @@
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from pydantic import BaseModel, EmailStr
-from pydantic.types import conint
+from pydantic.types import conint, conlist
+
+# toggles per bulk like request; all likes of one become a single INSERT
+BULK_LIKE_MAX_ITEMS = 500
 
 
 class UserCreate(BaseModel):
@@ -18,6 +21,13 @@ class User(BaseModel):
         orm_mode = True
 
 
+class UserStats(BaseModel):
+    user_id: int
+    post_count: int
+    likes_received: int
+    comment_count: int
+
+
 class UserLogin(BaseModel):
     email: EmailStr
     password: str
@@ -33,6 +43,10 @@ class PostCreate(PostBase):
     pass
 
 
+class PostImport(PostBase):
+    owner_id: int
+
+
 class Post(PostBase):
     id: int
     created_at: datetime
@@ -51,6 +65,12 @@ class PostOut(BaseModel):
         orm_mode = True
 
 
+class TrendingPost(BaseModel):
+    Post: Post
+    likes: int
+    score: float
+
+
 class Token(BaseModel):
     access_token: str
     token_type: str = "bearer"
@@ -66,6 +86,15 @@ class LikePost(BaseModel):
     direction: conint(le=1)
 
 
+LikePostBatch = conlist(LikePost, max_length=BULK_LIKE_MAX_ITEMS)
+
+
+class LikeStatus(BaseModel):
+    post_id: int
+    direction: int
+    status: str
+
+
 class CommentBase(BaseModel):
     comment: str
     post_id: int
@@ -99,6 +128,17 @@ class ImageCreate(ImageBase):
     pass
 
 
+class ImageSummary(Images):
+    created_at: datetime
+    width: Optional[int]
+    height: Optional[int]
+    format: Optional[str]
+    file_size: Optional[int]
+    camera_make: Optional[str]
+    camera_model: Optional[str]
+    taken_at: Optional[datetime]
+
+
 class ImageDetail(BaseModel):
     tags: dict
 
@@ -119,3 +159,15 @@ class Sizes(BaseModel):
     lower: Optional[int]
     width: Optional[int]
     height: Optional[int]
+
+
+class Profile(BaseModel):
+    name: str
+    created_at: datetime
+    files: List[str]
+
+
+class BulkImportResult(BaseModel):
+    inserted: int
+    failed: int
+    errors: List[dict]
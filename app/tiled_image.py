@@ -0,0 +1,205 @@
+import os
+import struct
+import tempfile
+
+IMAGE_TILED_THRESHOLD_PIXELS = int(os.getenv("IMAGE_TILED_THRESHOLD_PIXELS", 16_000_000))
+IMAGE_STRIP_BYTES = int(os.getenv("IMAGE_STRIP_BYTES", 4 * 1024 * 1024))
+
+BANDS = 3
+TIFF_MAX_BYTES = 2 ** 32 - 1
+
+
+class StripSource:
+    """
+    Uncompressed RGB image whose rows are read from disk a strip at a time.
+
+    Built from the tile list Pillow reports when opening a file, without decoding
+    it: every tile must be a full-width run of raw 8-bit RGB rows stored top to
+    bottom. This holds for binary PPM files and uncompressed striped TIFF files,
+    the usual formats of large scans. Strips are read with positioned reads rather
+    than through a memory map, whose touched pages would count towards the worker's
+    resident memory until the whole file was mapped in.
+
+    Args:
+        path (str): Path of the image file.
+        image_format (str): "PPM" or "TIFF".
+        size (tuple): (width, height) in pixels.
+        strips (List[tuple]): (first row, end row, file offset) of every raw tile.
+    """
+
+    def __init__(self, path, image_format, size, strips):
+        self.path = path
+        self.format = image_format
+        self.size = size
+        self.strips = strips
+
+    @property
+    def row_bytes(self):
+        return self.size[0] * BANDS
+
+    def rows_per_strip(self, strip_bytes=IMAGE_STRIP_BYTES):
+        return max(1, strip_bytes // self.row_bytes)
+
+    def iter_strips(self, upper=0, lower=None, strip_bytes=IMAGE_STRIP_BYTES):
+        """
+        Yield (row count, raw RGB bytes) for consecutive strips of rows.
+
+        Args:
+            upper (int): First row.
+            lower (int): Row after the last one; defaults to the image height.
+            strip_bytes (int): Upper bound of the bytes read at once.
+        """
+        lower = self.size[1] if lower is None else lower
+        step = self.rows_per_strip(strip_bytes)
+        with open(self.path, "rb") as file:
+            row = upper
+            while row < lower:
+                count = min(step, lower - row)
+                yield count, self._read_rows(file.fileno(), row, count)
+                row += count
+
+    def _read_rows(self, descriptor, row, count):
+        chunks = []
+        end = row + count
+        for first, last, offset in self.strips:
+            if last <= row or first >= end:
+                continue
+            start_row = max(row, first)
+            stop_row = min(end, last)
+            start = offset + (start_row - first) * self.row_bytes
+            chunks.append(os.pread(descriptor, (stop_row - start_row) * self.row_bytes, start))
+        return b"".join(chunks)
+
+
+def open_strip_source(path, threshold=IMAGE_TILED_THRESHOLD_PIXELS):
+    """
+    Return a StripSource for a large uncompressed image, or None.
+
+    None is returned for images of at most `threshold` pixels and for layouts that
+    cannot be read by rows (compressed data, other modes, tiles narrower than the
+    image, bottom-up rows); those are processed in memory instead.
+
+    Args:
+        path (str): Path of the image file.
+        threshold (int): Pixel count above which images are processed in strips.
+
+    Returns:
+        StripSource or None.
+    """
+    from PIL import Image
+
+    with Image.open(path) as image:
+        width, height = image.size
+        if width * height <= threshold or image.mode != "RGB" or image.format not in ("PPM", "TIFF"):
+            return None
+        if image.format == "TIFF" and width * height * BANDS > TIFF_MAX_BYTES:
+            return None
+        strips = []
+        for decoder, box, offset, args in image.tile:
+            if decoder != "raw" or box[0] != 0 or box[2] != width or not isinstance(args, tuple) or len(args) != 3:
+                return None
+            rawmode, stride, orientation = args
+            if rawmode != "RGB" or stride not in (0, width * BANDS) or orientation != 1:
+                return None
+            strips.append((box[1], box[3], offset))
+        return StripSource(path, image.format, image.size, sorted(strips))
+
+
+def tiff_header(width, height):
+    """
+    Build the header of a baseline uncompressed RGB TIFF holding one strip.
+
+    Returns:
+        bytes: Header and image file directory; pixel rows follow immediately.
+    """
+    entries = [
+        (256, 4, 1, width),          # ImageWidth
+        (257, 4, 1, height),         # ImageLength
+        (258, 3, BANDS, None),       # BitsPerSample, stored after the directory
+        (259, 3, 1, 1),              # Compression: none
+        (262, 3, 1, 2),              # PhotometricInterpretation: RGB
+        (273, 4, 1, None),           # StripOffsets
+        (277, 3, 1, BANDS),          # SamplesPerPixel
+        (278, 4, 1, height),         # RowsPerStrip
+        (279, 4, 1, width * height * BANDS),  # StripByteCounts
+        (284, 3, 1, 1),              # PlanarConfiguration: chunky
+    ]
+    directory_end = 8 + 2 + len(entries) * 12 + 4
+    bits_offset = directory_end
+    data_offset = bits_offset + BANDS * 2
+    header = b"II*\x00" + struct.pack("<I", 8) + struct.pack("<H", len(entries))
+    for tag, field_type, count, value in entries:
+        if tag == 258:
+            value = bits_offset
+        elif tag == 273:
+            value = data_offset
+        if field_type == 3 and count == 1:
+            header += struct.pack("<HHIHH", tag, field_type, count, value, 0)
+        else:
+            header += struct.pack("<HHII", tag, field_type, count, value)
+    header += struct.pack("<I", 0)
+    header += struct.pack("<" + "H" * BANDS, *([8] * BANDS))
+    return header
+
+
+def file_header(image_format, width, height):
+    if image_format == "PPM":
+        return b"P6\n%d %d\n255\n" % (width, height)
+    return tiff_header(width, height)
+
+
+def transform_strips(source, transform, box=None):
+    """
+    Write a transformed copy of an image over the original, one strip at a time.
+
+    The output is written in the format of the source to a temporary file in the
+    same directory, which then replaces the original, so a failure leaves the
+    original untouched. At most one input and one output strip are in memory.
+
+    Args:
+        source (StripSource): Image to transform.
+        transform: Function mapping a strip (PIL Image) to an RGB image of the same
+            height.
+        box (tuple): (left, upper, right, lower) crop box inside the image, or None.
+    """
+    from PIL import Image
+
+    width, height = source.size
+    left, upper, right, lower = box or (0, 0, width, height)
+    directory = os.path.dirname(os.path.abspath(source.path))
+    descriptor, temporary_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, "wb") as output:
+            output.write(file_header(source.format, right - left, lower - upper))
+            for rows, data in source.iter_strips(upper, lower):
+                strip = Image.frombuffer("RGB", (width, rows), data, "raw", "RGB", 0, 1)
+                if box is not None:
+                    strip = strip.crop((left, 0, right, rows))
+                output.write(transform(strip).tobytes())
+        os.chmod(temporary_path, os.stat(source.path).st_mode & 0o7777)
+        os.replace(temporary_path, source.path)
+    except BaseException:
+        os.remove(temporary_path)
+        raise
+
+
+def convert_color_strips(source, matrix):
+    """
+    Apply a color matrix to an image in strips, like `Image.convert("RGB", matrix)`.
+    """
+    transform_strips(source, lambda strip: strip.convert("RGB", matrix))
+
+
+def crop_strips(source, box):
+    """
+    Crop an image in strips, like `Image.crop(box)` for a box inside the image.
+
+    Returns:
+        bool: False if the box reaches outside the image and was not applied.
+    """
+    left, upper, right, lower = box
+    width, height = source.size
+    if not (0 <= left < right <= width and 0 <= upper < lower <= height):
+        return False
+    transform_strips(source, lambda strip: strip, box)
+    return True
@@ -1,7 +1,7 @@
-import jwt
+import os
+
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import jwt, JWTError
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 from app import schemas, database, models
@@ -9,11 +9,14 @@ from app import schemas, database, models
 
 SECRET_KEY = 'secret'
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
+ADMIN_EMAILS = {email.strip() for email in os.getenv("ADMIN_EMAILS", "").split(",") if email.strip()}
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
 
 
 def create_access_token(data: dict):
+    from jose import jwt
+
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
@@ -24,6 +27,8 @@ def create_access_token(data: dict):
 
 
 def verify_access_token(token: str, credentials_exception):
+    from jose import jwt, JWTError
+
     try:
         payload = jwt.decode(token, SECRET_KEY)
         user_id: str = payload.get("user_id")
@@ -31,11 +36,23 @@ def verify_access_token(token: str, credentials_exception):
             raise credentials_exception
 
         username = payload.get("sub")
-        return schemas.TokenData(id=user_id, username=username)
+        return schemas.TokenData(id=str(user_id), username=username)
     except JWTError:
         raise credentials_exception
 
 
+def get_token_user_id(token: str):
+    """
+    Return the user id of a valid access token, or None for an invalid one.
+    """
+    from jose import jwt, JWTError
+
+    try:
+        return jwt.decode(token, SECRET_KEY).get("user_id")
+    except JWTError:
+        return None
+
+
 def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
     credentials_exception = HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
                                           detail="Could not validate credentials",
@@ -43,3 +60,9 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     token = verify_access_token(token, credentials_exception)
     user = db.query(models.User).filter(models.User.id == token.id).first()
     return user
+
+
+def get_current_admin(current_user: models.User = Depends(get_current_user)):
+    if current_user is None or current_user.email not in ADMIN_EMAILS:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
+    return current_user
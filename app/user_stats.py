@@ -0,0 +1,173 @@
+"""
+Per-user activity counters.
+
+    python -m app.user_stats refresh
+
+Counters in `user_stats` are updated by the write paths in the same transaction
+as the change they count; the refresh command recomputes all of them from the
+posts, like_post and comments tables, e.g. after a bulk import.
+"""
+import argparse
+from collections import defaultdict
+
+from fastapi import HTTPException
+from sqlalchemy import and_, delete, func, or_, select
+from sqlalchemy.orm import joinedload
+from starlette import status
+
+from app import models
+from app.database import SessionLocal, dialect_insert
+
+COUNTERS = ("post_count", "likes_received", "comment_count")
+
+
+def change_user_stats(db, user_id, **deltas):
+    """
+    Add deltas to the counters of a user, creating the row if it is missing.
+
+    Args:
+        db (Database): Database session; the caller commits.
+        user_id: ID of the user.
+        **deltas: Counter name mapped to the amount to add.
+    """
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    table = models.UserStats.__table__
+    insert = dialect_insert(db)
+    statement = insert(models.UserStats).values(user_id=user_id, **deltas).on_conflict_do_update(
+        index_elements=[models.UserStats.user_id],
+        set_={name: table.c[name] + delta for name, delta in deltas.items()})
+    db.execute(statement)
+
+
+def apply_likes_received(db, deltas_by_post):
+    """
+    Credit like count changes of posts to their owners.
+
+    Args:
+        db (Database): Database session; the caller commits.
+        deltas_by_post (dict): Post id mapped to its like count delta.
+    """
+    if not deltas_by_post:
+        return
+    deltas_by_owner = defaultdict(int)
+    # likes of deleted posts were taken out of the owner's counters with the post
+    owners = db.execute(select(models.Post.id, models.Post.owner_id)
+                        .where(models.Post.id.in_(list(deltas_by_post)), models.Post.deleted_at.is_(None)))
+    for post_id, owner_id in owners:
+        deltas_by_owner[owner_id] += deltas_by_post[post_id]
+    for owner_id, delta in deltas_by_owner.items():
+        change_user_stats(db, owner_id, likes_received=delta)
+
+
+def remove_post_from_stats(db, post):
+    """
+    Take a deleted post out of its owner's counters.
+
+    The owner loses the post and its likes right away; the authors of its comments
+    lose them when the reaper purges the comments, which keeps this constant-time.
+
+    Args:
+        db (Database): Database session; the caller commits.
+        post (Post): Post being deleted.
+    """
+    change_user_stats(db, post.owner_id, post_count=-1, likes_received=-post.like_count)
+
+
+def check_user_exists(db, user_id):
+    if db.query(models.User.id).filter(models.User.id == user_id).first() is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail=f"User with {user_id} id was not found")
+
+
+def get_user_stats(db, user_id):
+    """
+    Get the activity counters of a user.
+
+    Returns:
+        dict: Post, received like and comment counts.
+
+    Raises:
+        HTTPException: If the user does not exist.
+    """
+    stats = db.query(models.UserStats).filter(models.UserStats.user_id == user_id).first()
+    if stats is None:
+        check_user_exists(db, user_id)
+        return {"user_id": user_id, **{name: 0 for name in COUNTERS}}
+    return {"user_id": user_id, **{name: getattr(stats, name) for name in COUNTERS}}
+
+
+def get_user_posts(db, user_id, limit, before_created_at=None, before_id=None):
+    """
+    Get a page of a user's posts, newest first.
+
+    Pages are addressed by the created_at and id of the last post of the previous
+    page and read from the (owner_id, created_at) index.
+
+    Args:
+        db (Database): Database session.
+        user_id: ID of the owner.
+        limit (int): Page size.
+        before_created_at (datetime): created_at of the last post of the previous page.
+        before_id (int): ID of the last post of the previous page.
+
+    Returns:
+        List[Post]: Posts with their owner loaded.
+
+    Raises:
+        HTTPException: If the user does not exist.
+    """
+    query = db.query(models.Post).options(joinedload(models.Post.owner)) \
+        .filter(models.Post.owner_id == user_id, models.Post.deleted_at.is_(None))
+    if before_created_at is not None and before_id is not None:
+        query = query.filter(or_(models.Post.created_at < before_created_at,
+                                 and_(models.Post.created_at == before_created_at, models.Post.id < before_id)))
+    posts = query.order_by(models.Post.created_at.desc(), models.Post.id.desc()).limit(limit).all()
+    if not posts:
+        # a non-empty page already proves that the owner exists
+        check_user_exists(db, user_id)
+    return posts
+
+
+def refresh_user_stats(db):
+    """
+    Recompute all counters from the posts, like_post and comments tables.
+
+    Returns:
+        int: Number of users with counters.
+    """
+    counters = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    for user_id, posts in db.execute(select(models.Post.owner_id, func.count(models.Post.id))
+                                     .where(models.Post.deleted_at.is_(None)).group_by(models.Post.owner_id)):
+        counters[user_id]["post_count"] = posts
+    for user_id, likes in db.execute(select(models.Post.owner_id, func.count())
+                                     .join(models.LikePost, models.LikePost.post_id == models.Post.id)
+                                     .where(models.Post.deleted_at.is_(None)).group_by(models.Post.owner_id)):
+        counters[user_id]["likes_received"] = likes
+    for user_id, comments in db.execute(select(models.Comment.user_id, func.count(models.Comment.id))
+                                        .group_by(models.Comment.user_id)):
+        counters[user_id]["comment_count"] = comments
+
+    db.execute(delete(models.UserStats))
+    if counters:
+        db.execute(models.UserStats.__table__.insert(),
+                   [{"user_id": user_id, **values} for user_id, values in counters.items()])
+    db.commit()
+    return len(counters)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain per-user activity counters.")
+    parser.add_argument("command", choices=["refresh"])
+    parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        print(f"Refreshed counters of {refresh_user_stats(db)} users")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,21 @@
-from passlib.context import CryptContext
+from functools import lru_cache
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.metrics import time_password_hash
+
+
+@lru_cache(maxsize=None)
+def get_pwd_context():
+    # passlib and its bcrypt backend are imported on first use, not at startup
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    with time_password_hash("hash"):
+        return get_pwd_context().hash(password)
 
 
 def verify(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    with time_password_hash("verify"):
+        return get_pwd_context().verify(plain_password, hashed_password)
@@ -0,0 +1,58 @@
+import io
+import logging
+import os
+import threading
+import time
+
+WARMUP_ENABLED = os.getenv("WARMUP", "0") == "1"
+
+logger = logging.getLogger(__name__)
+
+_warmed_up = False
+_lock = threading.Lock()
+
+
+def warm_up():
+    """
+    Load the lazily imported stacks before the first request needs them.
+
+    Imports Pillow and registers all its format plugins, decodes a tiny JPEG,
+    initializes the bcrypt backend of passlib, round-trips a JWT and opens a
+    database connection. Runs at most once per process.
+    """
+    global _warmed_up
+    with _lock:
+        if _warmed_up:
+            return
+        start = time.perf_counter()
+
+        from PIL import Image
+
+        Image.init()
+        buffer = io.BytesIO()
+        Image.new("RGB", (8, 8)).save(buffer, "JPEG")
+        buffer.seek(0)
+        Image.open(buffer).load()
+
+        from app.utils import get_pwd_context
+
+        try:
+            get_pwd_context().hash("warm-up")
+        except Exception:
+            logger.exception("Failed to initialize the password hashing backend")
+
+        from app.token import SECRET_KEY, create_access_token
+        from jose import jwt
+
+        jwt.decode(create_access_token({"user_id": 0}), SECRET_KEY)
+
+        from app.database import engine
+
+        try:
+            with engine.connect():
+                pass
+        except Exception:
+            logger.exception("Failed to open a database connection during warm-up")
+
+        _warmed_up = True
+        logger.info("Warm-up finished in %.0f ms", (time.perf_counter() - start) * 1000)
@@ -0,0 +1,99 @@
+"""
+Measure how abuse of an image route affects a cheap endpoint.
+
+    python -m benchmarks.bench_admission --abusers 64 --output admission.json
+
+A set of probe clients reads GET /posts/{post_id} while one user floods
+POST /update_color/{image_id} from `--abusers` concurrent connections. The probes
+are measured without abuse, and under abuse with admission control disabled and
+enabled; each mode runs in its own child process because RATE_LIMIT_ENABLED is
+read at import time.
+"""
+import argparse
+import asyncio
+import collections
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+from benchmarks.common import configure_database, percentile, write_results
+from benchmarks.seed import add_arguments, seed_from_arguments
+
+
+async def run_probes(args, seeded, abuse):
+    import httpx
+
+    from app.main import app
+    from app.token import create_access_token
+
+    token = create_access_token(data={"user_id": 1, "sub": "user1@example.com"})
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    durations = []
+    abuse_statuses = collections.Counter()
+    probing = True
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench",
+                                 headers={"Authorization": f"Bearer {token}"}) as client:
+        async def abuser():
+            while probing:
+                response = await client.post(f"/update_color/{random.randint(1, seeded['images'])}",
+                                             json={"color_code": "warm"})
+                abuse_statuses[response.status_code] += 1
+                # Stands in for the network round trip: the clients share the
+                # app's event loop, and shed requests never suspend on their own.
+                await asyncio.sleep(args.round_trip)
+
+        async def probe():
+            for _ in range(args.requests):
+                start = time.perf_counter()
+                await client.get(f"/posts/{random.randint(1, seeded['posts'])}")
+                durations.append((time.perf_counter() - start) * 1000)
+
+        abusers = [asyncio.ensure_future(abuser()) for _ in range(args.abusers if abuse else 0)]
+        await asyncio.sleep(0.5 if abuse else 0)
+        await asyncio.gather(*(probe() for _ in range(args.probes)))
+        probing = False
+        await asyncio.gather(*abusers)
+
+    durations.sort()
+    return {
+        "probe_p50_ms": round(percentile(durations, 0.50), 3),
+        "probe_p99_ms": round(percentile(durations, 0.99), 3),
+        "abuse_status": {str(code): count for code, count in sorted(abuse_statuses.items())},
+    }
+
+
+def run_child(args):
+    configure_database(args.database_url, rate_limit=args.mode == "limited")
+    seeded = seed_from_arguments(args)
+    print(json.dumps(asyncio.run(run_probes(args, seeded, args.mode != "idle"))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    add_arguments(parser)
+    parser.add_argument("--abusers", type=int, default=64)
+    parser.add_argument("--probes", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=100, help="requests per probe client")
+    parser.add_argument("--round-trip", type=float, default=0.005, help="seconds between abusive requests")
+    parser.add_argument("--output")
+    parser.add_argument("--mode", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_child(args)
+        return
+
+    results = {}
+    for mode in ("idle", "unlimited", "limited"):
+        child_args = [sys.executable, "-m", "benchmarks.bench_admission", "--mode", mode] + sys.argv[1:]
+        output = subprocess.run(child_args, env=dict(os.environ), check=True, capture_output=True, text=True).stdout
+        results[mode] = json.loads(output.strip().splitlines()[-1])
+    write_results(args.output, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Time post deletion against the number of likes and comments of the post.
+
+    python -m benchmarks.bench_delete --dependents 0 1000 10000 50000 --output delete.json
+
+For every dependent count, posts with that many likes and comments are deleted
+through DELETE /posts/{id}, then purged by the reaper. The request only marks the
+post, so its latency should not grow with the dependents; the purge does.
+"""
+import argparse
+import os
+import time
+
+from benchmarks.common import configure_database, environment, measure, reset_schema, summarize, write_results
+from benchmarks.seed import SEED_PASSWORD_HASH
+
+
+def seed_dependents(db, post_ids, dependents, owner_id=1):
+    """
+    Insert posts of `owner_id` with `dependents` likes and comments each.
+    """
+    from app import models
+
+    db.execute(models.Post.__table__.insert(),
+               [{"id": post_id, "title": f"Post {post_id}", "content": "Lorem ipsum", "image": "images/1.jpg",
+                 "owner_id": owner_id, "like_count": dependents} for post_id in post_ids])
+    for post_id in post_ids:
+        if dependents:
+            db.execute(models.LikePost.__table__.insert(),
+                       [{"post_id": post_id, "user_id": user_id} for user_id in range(1, dependents + 1)])
+            db.execute(models.Comment.__table__.insert(),
+                       [{"post_id": post_id, "user_id": user_id, "comment": "Comment"}
+                        for user_id in range(1, dependents + 1)])
+    db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url")
+    parser.add_argument("--dependents", type=int, nargs="+", default=[0, 1000, 10000, 50000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    url = configure_database(args.database_url)
+    os.environ["REAPER_ENABLED"] = "0"
+
+    from fastapi.testclient import TestClient
+
+    from app import models
+    from app.database import SessionLocal
+    from app.main import app
+    from app.reaper import reap
+    from app.token import create_access_token
+
+    reset_schema()
+    db = SessionLocal()
+    db.execute(models.User.__table__.insert(),
+               [{"id": i, "email": f"user{i}@example.com", "password": SEED_PASSWORD_HASH}
+                for i in range(1, max(args.dependents) + 2)])
+    db.commit()
+
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {create_access_token(data={'user_id': 1, 'sub': 'user1@example.com'})}"}
+    results = {}
+    next_id = 1
+    for dependents in args.dependents:
+        post_ids = list(range(next_id, next_id + args.repeat))
+        next_id += args.repeat
+        seed_dependents(db, post_ids, dependents)
+        remaining = iter(post_ids)
+        delete = measure(lambda: client.delete(f"/posts/{next(remaining)}", headers=headers), args.repeat, warmup=0)
+        start = time.perf_counter()
+        reap()
+        purge = summarize([(time.perf_counter() - start) * 1000 / args.repeat])
+        results[dependents] = {"delete": delete, "purge_per_post": purge}
+    db.close()
+    write_results(args.output, {"environment": environment(url), "dependents": results})
+
+
+if __name__ == "__main__":
+    main()
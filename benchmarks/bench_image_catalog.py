@@ -0,0 +1,85 @@
+"""
+Time image catalogue pages on a large images table.
+
+    python -m benchmarks.bench_image_catalog --images 500000 --output catalog.json
+
+Fills the images table with synthetic metadata rows (no files are written, since
+listing never opens them) and times the first page, a deep keyset page and
+filtered pages of GET /images/.
+"""
+import argparse
+import random
+from datetime import datetime, timedelta
+
+from benchmarks.common import configure_database, environment, measure, reset_schema, write_results
+
+FORMATS = ["JPEG", "PNG", "TIFF", "WEBP"]
+CAMERAS = [("Canon", "EOS R5"), ("Nikon", "Z 6"), ("Sony", "A7 IV"), ("Apple", "iPhone 15"), (None, None)]
+
+
+def seed_catalog(db, count, batch_size=10000, seed=0):
+    """
+    Insert `count` image rows with random metadata.
+    """
+    from app import models
+
+    generator = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    for first in range(1, count + 1, batch_size):
+        rows = []
+        for image_id in range(first, min(first + batch_size, count + 1)):
+            make, model = generator.choice(CAMERAS)
+            rows.append({
+                "id": image_id,
+                "image": f"/srv/images/{image_id}.jpg",
+                "created_at": start + timedelta(minutes=image_id),
+                "width": generator.choice([640, 1024, 1920, 4032, 6000]),
+                "height": generator.choice([480, 768, 1080, 3024, 4000]),
+                "format": generator.choice(FORMATS),
+                "file_size": generator.randint(20_000, 20_000_000),
+                "camera_make": make,
+                "camera_model": model,
+                "taken_at": start - timedelta(minutes=generator.randint(0, 10 ** 6)) if make else None,
+            })
+        db.execute(models.Images.__table__.insert(), rows)
+        db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url")
+    parser.add_argument("--images", type=int, default=500000)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    url = configure_database(args.database_url)
+
+    from fastapi.testclient import TestClient
+
+    from app.database import SessionLocal
+    from app.main import app
+
+    reset_schema()
+    db = SessionLocal()
+    seed_catalog(db, args.images)
+    db.close()
+
+    client = TestClient(app)
+    deep = args.images // 2
+    paths = {
+        "first page": "/images/",
+        "deep page": f"/images/?before_id={deep}",
+        "format": f"/images/?format=png&before_id={deep}",
+        "camera": "/images/?camera_make=Sony&camera_model=A7%20IV",
+        "large files": "/images/?min_size=19000000",
+        "min dimensions": "/images/?min_width=6000&min_height=4000",
+        "uploaded range": "/images/?uploaded_after=2024-03-01T00:00:00&uploaded_before=2024-03-02T00:00:00",
+        "sorted by date taken": "/images/?sort=taken",
+    }
+    results = {name: measure(lambda: client.get(path), args.repeat) for name, path in paths.items()}
+    write_results(args.output, {"environment": environment(url), "images": args.images, "pages": results})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Measure the request overhead of the metrics subsystem.
+
+    python -m benchmarks.bench_metrics_overhead --output results.json
+
+Runs the same requests in two child processes, one with METRICS_ENABLED=0 and one
+with METRICS_ENABLED=1, and reports latencies side by side. The setting is read at
+import time, which is why each mode needs its own process.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks.common import configure_database, measure, reset_schema, write_results
+from benchmarks.seed import seed_posts
+
+PATHS = ["/users/1", "/posts/fast/?search=Post%201", "/posts/1"]
+
+
+def run_child(args):
+    configure_database(args.database_url)
+
+    from fastapi.testclient import TestClient
+
+    from app.database import SessionLocal
+    from app.main import app
+
+    reset_schema()
+    db = SessionLocal()
+    seed_posts(db, args.users, args.posts)
+    db.close()
+
+    client = TestClient(app)
+    results = {path: measure(lambda: client.get(path), args.repeat) for path in PATHS}
+    print(json.dumps(results))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--posts", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--output")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+        return
+
+    child_args = [sys.executable, "-m", "benchmarks.bench_metrics_overhead", "--child",
+                  "--users", str(args.users), "--posts", str(args.posts), "--repeat", str(args.repeat)]
+    if args.database_url:
+        child_args += ["--database-url", args.database_url]
+
+    results = {}
+    for mode, enabled in (("disabled", "0"), ("enabled", "1")):
+        env = dict(os.environ, METRICS_ENABLED=enabled)
+        env.pop("PROMETHEUS_MULTIPROC_DIR", None)
+        output = subprocess.run(child_args, env=env, check=True, capture_output=True, text=True).stdout
+        results[mode] = json.loads(output.strip().splitlines()[-1])
+
+    results["overhead_median_ms"] = {
+        path: round(results["enabled"][path]["median_ms"] - results["disabled"][path]["median_ms"], 3)
+        for path in PATHS
+    }
+    write_results(args.output, results)
+
+
+if __name__ == "__main__":
+    main()
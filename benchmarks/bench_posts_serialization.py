@@ -0,0 +1,68 @@
+"""
+Compare the `/posts/` response paths.
+
+    python -m benchmarks.bench_posts_serialization --posts 5000 --output results.json
+
+Measures the `response_model=List[schemas.PostOut]` endpoint against the column-row
+orjson endpoint (buffered and streamed), end to end through the ASGI app, and the
+serialization step alone on already fetched rows.
+"""
+import argparse
+
+from benchmarks.common import configure_database, measure, reset_schema, write_results
+from benchmarks.seed import seed_posts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--posts", type=int, default=2000)
+    parser.add_argument("--likes-per-post", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    url = configure_database(args.database_url)
+
+    import orjson
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.testclient import TestClient
+    from sqlalchemy import func
+
+    from app import schemas
+    from app.crud_blog import get_all_posts, select_post_rows
+    from app.database import SessionLocal
+    from app.fast_json import post_row_to_dict
+    from app.main import app
+
+    reset_schema()
+    db = SessionLocal()
+    seeded = seed_posts(db, args.users, args.posts, args.likes_per_post)
+
+    client = TestClient(app)
+    endpoints = {
+        "response_model": "/posts/",
+        "orjson": "/posts/fast/",
+        "orjson_stream": "/posts/fast/?stream=true",
+    }
+    assert client.get(endpoints["response_model"]).json() == client.get(endpoints["orjson"]).json()
+
+    results = {"database": url.split(":", 1)[0], "seeded": seeded, "endpoint": {}, "serialization": {}}
+    for name, path in endpoints.items():
+        results["endpoint"][name] = measure(lambda: client.get(path).content, args.repeat)
+
+    orm_rows = get_all_posts(db, func, "")
+    column_rows = db.execute(select_post_rows("")).all()
+    results["serialization"]["response_model"] = measure(
+        lambda: orjson.dumps(jsonable_encoder([schemas.PostOut.model_validate(row, from_attributes=True)
+                                               for row in orm_rows])), args.repeat)
+    results["serialization"]["orjson"] = measure(
+        lambda: orjson.dumps([post_row_to_dict(row) for row in column_rows]), args.repeat)
+    db.close()
+
+    write_results(args.output, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Measure cold start: time until a fresh API process answers its first requests.
+
+    python -m benchmarks.bench_startup --output startup.json
+
+Starts `uvicorn app.main:app` against a seeded SQLite database, polls until
+`GET /users/1` returns 200 and then times the first image and token requests. It
+runs once without and once with WARMUP=1, which moves the Pillow, bcrypt and jose
+initialization from the first requests to startup.
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+from benchmarks.common import configure_database, environment, write_results
+from benchmarks.seed import add_arguments, seed_from_arguments
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def request(url, data=None):
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, data=data, timeout=30) as response:
+            status = response.status
+    except urllib.error.HTTPError as error:
+        status = error.code
+    return status, round((time.perf_counter() - start) * 1000, 1)
+
+
+def measure_start(env, timeout=60):
+    """
+    Start the server and time its first responses.
+
+    Returns:
+        dict: Time to first 200 and latency of the first image and token requests in ms.
+    """
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+                                "--log-level", "warning"], env=env)
+    try:
+        while True:
+            if time.perf_counter() - start > timeout:
+                raise TimeoutError("server did not answer in time")
+            try:
+                status, _ = request(f"{base_url}/users/1")
+            except OSError:
+                time.sleep(0.01)
+                continue
+            if status == 200:
+                break
+        result = {"first_200_ms": round((time.perf_counter() - start) * 1000, 1)}
+        status, result["first_image_detail_ms"] = request(f"{base_url}/image_detail/1")
+        # a wrong password still runs the bcrypt verification
+        status, result["first_login_ms"] = request(f"{base_url}/login/",
+                                                   b"username=user1%40example.com&password=wrong")
+        return result
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    add_arguments(parser)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--output")
+    parser.set_defaults(posts=100, images=1)
+    args = parser.parse_args()
+
+    url = configure_database(args.database_url)
+    seeded = seed_from_arguments(args)
+
+    results = {"environment": environment(url), "seeded": seeded}
+    for mode, warmup in (("lazy", "0"), ("warmup", "1")):
+        env = dict(os.environ, WARMUP=warmup)
+        runs = [measure_start(env) for _ in range(args.runs)]
+        results[mode] = {key: min(run[key] for run in runs) for key in runs[0]}
+    write_results(args.output, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Compare peak memory of in-memory and strip-wise image processing.
+
+    python -m benchmarks.bench_tiled_images --width 8000 --height 6000 --output tiled.json
+
+Writes a large gradient image as binary PPM and uncompressed TIFF, then runs
+`update_color` and a crop through `update_size` on it in child processes, once with
+strips disabled and once enabled through IMAGE_TILED_THRESHOLD_PIXELS. Every child
+reports its duration and the growth of its peak resident set size.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import configure_database, reset_schema, write_results
+
+MODES = {"memory": str(2 ** 62), "strips": "0"}
+
+
+def write_gradient(path, width, height):
+    """
+    Write an RGB gradient as PPM or TIFF (by extension) without holding it in memory.
+    """
+    from app.tiled_image import file_header
+
+    image_format = "TIFF" if path.endswith(".tif") else "PPM"
+    row = bytes(value for x in range(width) for value in (x * 255 // width, 128, 255 - x * 255 // width))
+    with open(path, "wb") as output:
+        output.write(file_header(image_format, width, height))
+        for _ in range(height):
+            output.write(row)
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_child(args):
+    configure_database(args.database_url)
+
+    from app import models, schemas
+    from app.crud_image_analyze import update_color, update_size
+    from app.database import SessionLocal
+
+    reset_schema()
+    db = SessionLocal()
+    db.add(models.Images(id=1, image=args.path))
+    db.commit()
+
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    if args.operation == "color":
+        update_color(1, schemas.Colors(color_code="warm"), db)
+    else:
+        update_size(1, schemas.Sizes(left=1, upper=1, right=args.width - 1, lower=args.height - 1,
+                                        width=None, height=None), db)
+    duration = time.perf_counter() - start
+    db.close()
+    print(json.dumps({"seconds": round(duration, 3), "peak_rss_growth_mb": round(peak_rss_mb() - baseline, 1)}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url")
+    parser.add_argument("--width", type=int, default=8000)
+    parser.add_argument("--height", type=int, default=6000)
+    parser.add_argument("--output")
+    parser.add_argument("--path", help=argparse.SUPPRESS)
+    parser.add_argument("--operation", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.operation:
+        run_child(args)
+        return
+
+    directory = tempfile.mkdtemp(prefix="blog-bench-tiled-")
+    results = {"pixels": args.width * args.height}
+    for extension in ("ppm", "tif"):
+        for operation in ("color", "crop"):
+            for mode, threshold in MODES.items():
+                path = os.path.join(directory, f"image.{extension}")
+                write_gradient(path, args.width, args.height)
+                child_args = [sys.executable, "-m", "benchmarks.bench_tiled_images", "--operation", operation,
+                              "--path", path, "--width", str(args.width), "--height", str(args.height)]
+                if args.database_url:
+                    child_args += ["--database-url", args.database_url]
+                env = dict(os.environ, IMAGE_TILED_THRESHOLD_PIXELS=threshold)
+                output = subprocess.run(child_args, env=env, check=True, capture_output=True, text=True).stdout
+                results[f"{extension} {operation} {mode}"] = json.loads(output.strip().splitlines()[-1])
+                os.remove(path)
+    write_results(args.output, results)
+
+
+if __name__ == "__main__":
+    main()
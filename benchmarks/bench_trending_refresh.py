@@ -0,0 +1,59 @@
+"""
+Measure the cost of refreshing trending scores against table size.
+
+    python -m benchmarks.bench_trending_refresh --sizes 1000 10000 100000
+
+For every size the schema is recreated and seeded, then a full score refresh, an
+incremental rescore of one post and trending page reads (first page and a deep
+page) are timed. The refresh grows with the table; rescores and page reads should
+not.
+"""
+import argparse
+
+from benchmarks.common import configure_database, environment, measure, reset_schema, write_results
+from benchmarks.seed import seed_posts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--likes-per-post", type=int, default=3)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    url = configure_database(args.database_url)
+
+    from app.database import SessionLocal
+    from app.ranking import get_trending_posts, refresh_scores, rescore_posts
+
+    results = {"environment": environment(url), "sizes": {}}
+    for size in args.sizes:
+        reset_schema()
+        db = SessionLocal()
+        seed_posts(db, args.users, size, args.likes_per_post)
+        refresh = measure(lambda: refresh_scores(db), args.repeat, warmup=0)
+
+        def rescore():
+            rescore_posts(db, [size // 2])
+            db.commit()
+
+        deep = get_trending_posts(db, size // 2)[-1]
+        after_score, after_id = deep[1], deep[0].id
+        results["sizes"][size] = {
+            "refresh": refresh,
+            "refresh_per_1000_posts_ms": round(refresh["median_ms"] / size * 1000, 3),
+            "rescore_one_post": measure(rescore, args.repeat * 10),
+            "first_page": measure(lambda: get_trending_posts(db, args.page_size), args.repeat * 10),
+            "deep_page": measure(lambda: get_trending_posts(db, args.page_size, after_score, after_id),
+                                 args.repeat * 10),
+        }
+        db.close()
+    write_results(args.output, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Check the import time of the app against a budget.
+
+    python -m benchmarks.check_import_budget --budget-ms 1500
+
+Imports `app.main` in a fresh interpreter with `-X importtime` and fails when the
+cumulative import time exceeds the budget, or when one of the lazily loaded stacks
+(Pillow, passlib, python-jose) is imported at startup.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+LAZY_MODULES = ("PIL", "passlib", "jose")
+
+
+def import_times(module, runs=3):
+    """
+    Import a module in fresh interpreters and report the fastest run.
+
+    Returns:
+        tuple: (cumulative import time of the module in ms, set of imported top-level packages)
+    """
+    best = None
+    packages = set()
+    for _ in range(runs):
+        env = dict(os.environ, PYTHONDONTWRITEBYTECODE="")
+        output = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                                env=env, capture_output=True, text=True, check=True).stderr
+        for line in output.splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            _, cumulative, name = line[len("import time:"):].split("|")
+            name = name.strip()
+            packages.add(name.split(".")[0])
+            if name == module:
+                total = int(cumulative) / 1000
+                best = total if best is None else min(best, total)
+    return best, packages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--budget-ms", type=float, default=1500)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    total_ms, packages = import_times(args.module, args.runs)
+    eager = sorted(set(LAZY_MODULES) & packages)
+    print(f"import {args.module}: {total_ms:.0f} ms (budget {args.budget_ms:.0f} ms)")
+    if eager:
+        print(f"eagerly imported: {', '.join(eager)}")
+    if total_ms > args.budget_ms or eager:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Helpers shared by the benchmark scripts.
+
+The scripts run against a throwaway SQLite database unless DATABASE_URL points
+somewhere else. `configure_database` must run before anything from `app` is
+imported, because `app.database` reads DATABASE_URL at import time.
+"""
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+
+
+def configure_database(url=None, cache=False, rate_limit=False):
+    """
+    Point the app at the benchmark database.
+
+    Args:
+        url (str): Database URL. Defaults to a new SQLite file in the temp directory.
+        cache (bool): Keep the response cache enabled.
+        rate_limit (bool): Keep admission control enabled.
+
+    Returns:
+        str: The database URL in use.
+    """
+    if url is None:
+        url = os.environ.get("DATABASE_URL")
+    if url is None:
+        url = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="blog-bench-"), "bench.db")
+    os.environ["DATABASE_URL"] = url
+    if not cache:
+        os.environ["CACHE_TTL_SECONDS"] = "0"
+    if not rate_limit:
+        os.environ["RATE_LIMIT_ENABLED"] = "0"
+    return url
+
+
+def reset_schema():
+    """
+    Drop and recreate all tables.
+
+    SQLite only generates ids for a single integer primary key column, so on SQLite
+    the composite key of comments is created as a key on its id alone.
+    """
+    from sqlalchemy import MetaData, PrimaryKeyConstraint
+
+    from app import models  # noqa: F401
+    from app.database import Base, engine
+
+    Base.metadata.drop_all(engine)
+    if engine.dialect.name != "sqlite":
+        Base.metadata.create_all(engine)
+        return
+    metadata = MetaData()
+    for table in Base.metadata.sorted_tables:
+        table.to_metadata(metadata)
+    comments = metadata.tables["comments"]
+    for column in comments.primary_key.columns:
+        column.primary_key = False
+    comments.append_constraint(PrimaryKeyConstraint(comments.c.id))
+    metadata.create_all(engine)
+
+
+def measure(func, repeat=20, warmup=2):
+    """
+    Time repeated calls of a function.
+
+    Args:
+        func: Callable without arguments.
+        repeat (int): Number of timed calls.
+        warmup (int): Number of untimed calls made first.
+
+    Returns:
+        dict: Mean, median, p95 and min duration in milliseconds.
+    """
+    for _ in range(warmup):
+        func()
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append((time.perf_counter() - start) * 1000)
+    durations.sort()
+    return summarize(durations)
+
+
+def percentile(durations, fraction):
+    """
+    Nearest-rank percentile of sorted durations.
+    """
+    return durations[min(len(durations) - 1, int(len(durations) * fraction))]
+
+
+def summarize(durations):
+    """
+    Summarize sorted durations in milliseconds.
+
+    Returns:
+        dict: Mean, median, p95 and min duration.
+    """
+    return {
+        "mean_ms": round(statistics.fmean(durations), 3),
+        "median_ms": round(statistics.median(durations), 3),
+        "p95_ms": round(percentile(durations, 0.95), 3),
+        "min_ms": round(durations[0], 3),
+    }
+
+
+def environment(url):
+    """
+    Describe where the benchmark ran, so results of different commits can be compared.
+
+    Returns:
+        dict: Git commit, Python version, platform and database dialect.
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "database": url.split(":", 1)[0],
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+
+
+def write_results(path, results):
+    """
+    Write benchmark results as JSON, or print them when no path is given.
+    """
+    text = json.dumps(results, indent=2, default=str)
+    if path:
+        with open(path, "w") as output:
+            output.write(text + "\n")
+    else:
+        print(text)
@@ -0,0 +1,56 @@
+"""
+Compare two benchmark result files and flag regressions.
+
+    python -m benchmarks.compare baseline.json candidate.json --threshold 0.15
+
+Compares the median of every micro-benchmark and the p95 of every load test
+endpoint. Exits with status 1 when one of them got slower by more than the
+threshold.
+"""
+import argparse
+import json
+import sys
+
+METRICS = {"micro": "median_ms", "load": "p95_ms"}
+
+
+def compare(baseline, candidate, threshold):
+    """
+    List the changes between two result files.
+
+    Returns:
+        List[dict]: Section, name, both values, relative change and regression flag.
+    """
+    rows = []
+    for section, metric in METRICS.items():
+        for name, result in candidate.get(section, {}).items():
+            before = baseline.get(section, {}).get(name)
+            if before is None or not before[metric]:
+                continue
+            change = result[metric] / before[metric] - 1
+            rows.append({"section": section, "name": name, "metric": metric, "baseline": before[metric],
+                         "candidate": result[metric], "change": round(change, 3),
+                         "regression": change > threshold})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.15)
+    args = parser.parse_args()
+
+    with open(args.baseline) as baseline_file, open(args.candidate) as candidate_file:
+        rows = compare(json.load(baseline_file), json.load(candidate_file), args.threshold)
+
+    for row in rows:
+        flag = "REGRESSION" if row["regression"] else ""
+        print(f"{row['section']:6} {row['name']:36} {row['metric']:10} {row['baseline']:>10.3f} "
+              f"{row['candidate']:>10.3f} {row['change']:+8.1%} {flag}")
+    if any(row["regression"] for row in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+In-process load generator for the ASGI app.
+
+    python -m benchmarks.load --concurrency 16 --requests 500 --output load.json
+
+Requests are sent through httpx's ASGI transport, so no server or network is
+involved. Every endpoint is loaded separately by `--concurrency` clients and
+reported with throughput, status codes and p50/p95/p99 latency.
+"""
+import argparse
+import asyncio
+import collections
+import itertools
+import random
+import time
+
+from benchmarks.common import configure_database, environment, percentile, write_results
+from benchmarks.seed import add_arguments, seed_from_arguments
+
+
+def build_scenarios(seeded):
+    """
+    Describe the requests sent to every endpoint.
+
+    Args:
+        seeded (dict): Volumes returned by `seed_from_arguments`.
+
+    Returns:
+        dict: Endpoint name mapped to a function returning (method, url, json body).
+    """
+    posts = seeded["posts"]
+    users = seeded["users"]
+    scenarios = {
+        "GET /posts/": lambda: ("GET", "/posts/", None),
+        "GET /posts/?search": lambda: ("GET", f"/posts/?search=Post {random.randint(1, 9)}", None),
+        "GET /posts/fast/": lambda: ("GET", "/posts/fast/", None),
+        "GET /posts/{post_id}": lambda: ("GET", f"/posts/{random.randint(1, posts)}", None),
+        "GET /users/{user_id}": lambda: ("GET", f"/users/{random.randint(1, users)}", None),
+        "POST /like_post/": lambda: ("POST", "/like_post/",
+                                     {"post_id": random.randint(1, posts), "direction": random.randint(0, 1)}),
+    }
+    if seeded["images"]:
+        images = seeded["images"]
+        width, height = seeded["image_size"]
+        scenarios.update({
+            "GET /image_detail/{image_id}": lambda: ("GET", f"/image_detail/{random.randint(1, images)}", None),
+            "POST /update_size/{image_id}": lambda: ("POST", f"/update_size/{random.randint(1, images)}",
+                                                     {"left": 0, "upper": 0, "right": width, "lower": height,
+                                                      "width": width, "height": height}),
+            "POST /update_color/{image_id}": lambda: ("POST", f"/update_color/{random.randint(1, images)}",
+                                                      {"color_code": "warm"}),
+        })
+    return scenarios
+
+
+async def load_endpoint(client, scenario, requests, concurrency):
+    """
+    Send `requests` requests from `concurrency` concurrent clients.
+
+    Returns:
+        dict: Throughput, status code counts and latency percentiles in milliseconds.
+    """
+    counter = itertools.count()
+    durations = []
+    statuses = collections.Counter()
+
+    async def worker():
+        while next(counter) < requests:
+            method, url, body = scenario()
+            start = time.perf_counter()
+            response = await client.request(method, url, json=body)
+            durations.append((time.perf_counter() - start) * 1000)
+            statuses[response.status_code] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    durations.sort()
+    return {
+        "requests": len(durations),
+        "throughput_rps": round(len(durations) / elapsed, 1),
+        "status": {str(code): count for code, count in sorted(statuses.items())},
+        "p50_ms": round(percentile(durations, 0.50), 3),
+        "p95_ms": round(percentile(durations, 0.95), 3),
+        "p99_ms": round(percentile(durations, 0.99), 3),
+    }
+
+
+async def run_load(seeded, requests=200, concurrency=8, endpoints=None):
+    """
+    Load every endpoint of the app in turn.
+
+    Args:
+        seeded (dict): Volumes returned by `seed_from_arguments`.
+        requests (int): Requests per endpoint.
+        concurrency (int): Concurrent clients.
+        endpoints (List[str]): Endpoint names to load, or None for all.
+
+    Returns:
+        dict: Result of `load_endpoint` per endpoint.
+    """
+    import httpx
+
+    from app.main import app
+    from app.token import create_access_token
+
+    token = create_access_token(data={"user_id": 1, "sub": "user1@example.com"})
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    results = {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench",
+                                 headers={"Authorization": f"Bearer {token}"}) as client:
+        for name, scenario in build_scenarios(seeded).items():
+            if endpoints and name not in endpoints:
+                continue
+            results[name] = await load_endpoint(client, scenario, requests, concurrency)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    add_arguments(parser)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--endpoint", action="append", dest="endpoints")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    url = configure_database(args.database_url)
+    seeded = seed_from_arguments(args)
+    results = asyncio.run(run_load(seeded, args.requests, args.concurrency, args.endpoints))
+    write_results(args.output, {"environment": environment(url), "seeded": seeded, "load": results})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Micro-benchmarks of the blog and image CRUD functions.
+
+    python -m benchmarks.micro --posts 5000 --output micro.json
+
+Each function is called directly with a database session, without HTTP.
+"""
+import argparse
+import itertools
+
+from benchmarks.common import configure_database, environment, measure, write_results
+from benchmarks.seed import add_arguments, seed_from_arguments
+
+
+def run_micro(seeded, repeat=20):
+    """
+    Time the CRUD functions against a seeded database.
+
+    Args:
+        seeded (dict): Volumes returned by `seed_from_arguments`.
+        repeat (int): Timed calls per function.
+
+    Returns:
+        dict: Timing summary per function.
+    """
+    from sqlalchemy import func
+
+    from app import models, schemas
+    from app.crud_blog import get_all_posts, like_post_func
+    from app.crud_image_analyze import image_detail_data, update_color, update_size
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    results = {}
+    try:
+        user = db.query(models.User).filter(models.User.id == 1).first()
+        results["get_all_posts"] = measure(lambda: get_all_posts(db, func, ""), repeat)
+        results["get_all_posts_search"] = measure(lambda: get_all_posts(db, func, "Post 1"), repeat)
+
+        # start from "not liked" so that alternating like/unlike calls never conflict
+        post_id = seeded["posts"]
+        db.query(models.LikePost).filter(models.LikePost.post_id == post_id,
+                                         models.LikePost.user_id == user.id).delete()
+        db.commit()
+        directions = itertools.cycle([1, 0])
+        results["like_post_func"] = measure(
+            lambda: like_post_func(db, user, schemas.LikePost(post_id=post_id, direction=next(directions))),
+            repeat * 2)
+
+        if seeded["images"]:
+            width, height = seeded["image_size"]
+            sizes = schemas.Sizes(left=0, upper=0, right=width, lower=height, width=width, height=height)
+            results["image_detail_data"] = measure(lambda: image_detail_data(db, 1), repeat)
+            results["update_size"] = measure(lambda: update_size(1, sizes, db), repeat)
+            results["update_color"] = measure(lambda: update_color(1, schemas.Colors(color_code="warm"), db),
+                                              repeat)
+    finally:
+        db.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    add_arguments(parser)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    url = configure_database(args.database_url)
+    seeded = seed_from_arguments(args)
+    write_results(args.output, {"environment": environment(url), "seeded": seeded,
+                                "micro": run_micro(seeded, args.repeat)})
+
+
+if __name__ == "__main__":
+    main()
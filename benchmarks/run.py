@@ -0,0 +1,40 @@
+"""
+Run the seeding, micro-benchmarks and load test in one go.
+
+    python -m benchmarks.run --output results/$(git rev-parse --short HEAD).json
+    python -m benchmarks.compare results/old.json results/new.json
+
+Uses a throwaway SQLite database unless --database-url (or DATABASE_URL) points
+to a local Postgres.
+"""
+import argparse
+import asyncio
+
+from benchmarks.common import configure_database, environment, write_results
+from benchmarks.seed import add_arguments, seed_from_arguments
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    add_arguments(parser)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    url = configure_database(args.database_url)
+
+    from benchmarks.load import run_load
+    from benchmarks.micro import run_micro
+
+    seeded = seed_from_arguments(args)
+    results = {"environment": environment(url), "seeded": seeded, "micro": run_micro(seeded, args.repeat)}
+    # micro-benchmarks leave likes and edited images behind, so load runs on fresh data
+    seeded = seed_from_arguments(args)
+    results["load"] = asyncio.run(run_load(seeded, args.requests, args.concurrency))
+    write_results(args.output, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Seed the benchmark database with users, posts, likes, comments and images.
+
+    python -m benchmarks.seed --users 100 --posts 5000 --images 20
+
+Rows are inserted with executemany and explicit ids, so seeding a large volume
+takes seconds. Images are synthetic JPEGs with EXIF tags written to --image-dir.
+"""
+import argparse
+import os
+import tempfile
+
+from benchmarks.common import configure_database, reset_schema
+
+SEED_PASSWORD_HASH = "$2b$12$benchmark.seed.password.hash.not.usable.for.login...."
+
+
+def seed_posts(db, users=50, posts=1000, likes_per_post=5, comments_per_post=0):
+    """
+    Insert users, posts, likes and comments.
+
+    Args:
+        db (Database): Database session.
+        users (int): Number of users.
+        posts (int): Number of posts.
+        likes_per_post (int): Likes per post, capped by the number of users.
+        comments_per_post (int): Comments per post.
+
+    Returns:
+        dict: Number of rows inserted per table.
+    """
+    from app import models
+
+    db.execute(models.User.__table__.insert(),
+               [{"id": i, "email": f"user{i}@example.com", "password": SEED_PASSWORD_HASH}
+                for i in range(1, users + 1)])
+    likes_per_post = min(likes_per_post, users)
+    db.execute(models.Post.__table__.insert(),
+               [{"id": i, "title": f"Post {i}", "content": "Lorem ipsum dolor sit amet " * 4,
+                 "image": f"images/{i}.jpg", "owner_id": i % users + 1, "like_count": likes_per_post}
+                for i in range(1, posts + 1)])
+    likes = [{"post_id": post_id, "user_id": (post_id + offset) % users + 1}
+             for post_id in range(1, posts + 1) for offset in range(likes_per_post)]
+    if likes:
+        db.execute(models.LikePost.__table__.insert(), likes)
+    comments = [{"post_id": post_id, "user_id": (post_id * 7 + offset) % users + 1,
+                 "comment": f"Comment {offset} on post {post_id}"}
+                for post_id in range(1, posts + 1) for offset in range(comments_per_post)]
+    if comments:
+        db.execute(models.Comment.__table__.insert(), comments)
+    db.commit()
+    return {"users": users, "posts": posts, "likes": len(likes), "comments": len(comments)}
+
+
+def make_image(path, width, height, seed=0):
+    """
+    Write a synthetic RGB JPEG with a gradient and a few EXIF tags.
+
+    Args:
+        path (str): Output file.
+        width (int): Width in pixels.
+        height (int): Height in pixels.
+        seed (int): Varies the content and tags between images.
+    """
+    from PIL import Image
+
+    red = Image.linear_gradient("L").resize((width, height))
+    green = red.transpose(Image.Transpose.ROTATE_90).resize((width, height))
+    blue = Image.new("L", (width, height), seed * 37 % 256)
+    image = Image.merge("RGB", (red, green, blue))
+    exif = Image.Exif()
+    exif[0x010F] = "Benchmark"
+    exif[0x0110] = f"Synthetic {seed % 5}"
+    exif[0x0132] = "2024:03:10 14:11:22"
+    image.save(path, "JPEG", quality=90, exif=exif)
+
+
+def seed_images(db, count=10, directory=None, width=1024, height=768):
+    """
+    Create synthetic image files and their rows.
+
+    Args:
+        db (Database): Database session.
+        count (int): Number of images.
+        directory (str): Directory for the files. Defaults to a new temp directory.
+        width (int): Width of every image.
+        height (int): Height of every image.
+
+    Returns:
+        dict: Number of images and the directory holding them.
+    """
+    from app import models
+    from app.image_catalog import extract_image_metadata
+
+    directory = directory or tempfile.mkdtemp(prefix="blog-bench-images-")
+    os.makedirs(directory, exist_ok=True)
+    rows = []
+    for i in range(1, count + 1):
+        path = os.path.join(directory, f"image{i}.jpg")
+        make_image(path, width, height, i)
+        rows.append({"id": i, "image": path, **extract_image_metadata(path)})
+    if rows:
+        db.execute(models.Images.__table__.insert(), rows)
+    db.commit()
+    return {"images": count, "image_dir": directory, "image_size": [width, height]}
+
+
+def add_arguments(parser):
+    parser.add_argument("--database-url")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--posts", type=int, default=2000)
+    parser.add_argument("--likes-per-post", type=int, default=5)
+    parser.add_argument("--comments-per-post", type=int, default=2)
+    parser.add_argument("--images", type=int, default=10)
+    parser.add_argument("--image-dir")
+    parser.add_argument("--image-width", type=int, default=1024)
+    parser.add_argument("--image-height", type=int, default=768)
+
+
+def seed_from_arguments(args):
+    """
+    Recreate the schema and seed every table from parsed command line arguments.
+
+    Returns:
+        dict: Seeded volumes.
+    """
+    from app.database import SessionLocal
+
+    reset_schema()
+    db = SessionLocal()
+    try:
+        seeded = seed_posts(db, args.users, args.posts, args.likes_per_post, args.comments_per_post)
+        seeded.update(seed_images(db, args.images, args.image_dir, args.image_width, args.image_height))
+    finally:
+        db.close()
+    return seeded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    add_arguments(parser)
+    args = parser.parse_args()
+    url = configure_database(args.database_url)
+    seeded = seed_from_arguments(args)
+    print(f"Seeded {url}: {seeded}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+import os
+
+from prometheus_client import multiprocess
+
+
+def post_fork(server, worker):
+    # WARMUP=1 loads Pillow, bcrypt, jose and a DB connection before the worker takes traffic
+    if os.getenv("WARMUP", "0") == "1":
+        from app.warmup import warm_up
+
+        warm_up()
+
+
+def child_exit(server, worker):
+    # drop the live gauges of a dead worker from the shared PROMETHEUS_MULTIPROC_DIR
+    multiprocess.mark_process_dead(worker.pid)
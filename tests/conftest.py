@@ -0,0 +1,34 @@
+import os
+import tempfile
+
+# app.database and the app's settings are read at import time
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="blog-tests-"), "test.db")
+os.environ.setdefault("CACHE_BACKEND", "fake-redis")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+os.environ.setdefault("REAPER_ENABLED", "0")
+os.environ["ADMIN_EMAILS"] = "admin@example.com"
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.cache import response_cache  # noqa: E402
+from app.main import app  # noqa: E402
+from benchmarks.common import reset_schema  # noqa: E402
+
+
+@pytest.fixture
+def client():
+    reset_schema()
+    response_cache.backend.client.flushall()
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def login(client):
+    def login_as(email, password="secret"):
+        client.post("/users/", json={"email": email, "password": password})
+        token = client.post("/login/", data={"username": email, "password": password}).json()["access_token"]
+        return {"Authorization": f"Bearer {token}"}
+
+    return login_as
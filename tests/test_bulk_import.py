@@ -0,0 +1,38 @@
+import json
+from types import SimpleNamespace
+
+from app import models
+from app.bulk_import import copy_rows, import_lines
+
+
+class RecordingCursor:
+    def __init__(self):
+        self.copies = []
+
+    def copy_expert(self, statement, buffer):
+        self.copies.append((statement, buffer.read()))
+
+    def close(self):
+        pass
+
+
+def test_copy_rows_keeps_empty_strings():
+    cursor = RecordingCursor()
+    # stands in for session.connection().connection, the raw psycopg2 connection
+    session = SimpleNamespace(connection=lambda: SimpleNamespace(connection=SimpleNamespace(cursor=lambda: cursor)))
+
+    copy_rows(session, models.Post.__table__, ("title", "content", "image", "owner_id"),
+              [{"title": "", "content": "Content", "image": "", "owner_id": 1}])
+
+    statement, data = cursor.copies[0]
+    assert statement.startswith("COPY posts (title, content, image, owner_id) FROM STDIN")
+    # a bare empty field would be read by COPY as NULL
+    assert data == '"","Content","","1"\r\n'
+
+
+def test_import_posts_with_empty_strings(client, login):
+    login("author@example.com")
+    lines = [json.dumps({"title": "", "content": "Content", "image": "", "owner_id": 1}),
+             json.dumps({"title": "Title", "content": "Content", "image": "image.jpg", "owner_id": 1})]
+
+    assert import_lines("posts", lines) == {"inserted": 2, "failed": 0, "errors": []}
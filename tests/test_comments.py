@@ -0,0 +1,36 @@
+from app import models
+from app.cache import response_cache
+from app.database import SessionLocal
+
+
+def create_post_with_comment(client, headers):
+    post_id = client.post("/posts/", json={"title": "Title", "content": "Content", "image": "image.jpg"},
+                          headers=headers).json()["id"]
+    comment_id = client.post("/new_comment/", json={"post_id": post_id, "comment": "Nice"},
+                             headers=headers).json()["id"]
+    return post_id, comment_id
+
+
+def test_delete_comment(client, login):
+    headers = login("author@example.com")
+    post_id, comment_id = create_post_with_comment(client, headers)
+    assert client.get(f"/posts/{post_id}").status_code == 200
+    version = response_cache.version("post", post_id)
+
+    response = client.delete(f"/comment/{comment_id}", headers=headers)
+
+    assert response.status_code == 204
+    assert response_cache.version("post", post_id) == version + 1
+    db = SessionLocal()
+    try:
+        assert db.get(models.Post, post_id).comment_count == 0
+        assert db.query(models.Comment).count() == 0
+    finally:
+        db.close()
+    assert client.get("/users/1/stats").json()["comment_count"] == 0
+
+
+def test_delete_missing_comment(client, login):
+    headers = login("author@example.com")
+
+    assert client.delete("/comment/1", headers=headers).status_code == 404
@@ -0,0 +1,29 @@
+import json
+
+import pytest
+
+from app import models
+from app.database import SessionLocal
+
+
+@pytest.mark.parametrize("kind", ["posts", "comments", "images"])
+def test_export_requires_admin(client, login, kind):
+    assert client.get(f"/export/{kind}").status_code == 401
+    assert client.get(f"/export/{kind}", headers=login("reader@example.com")).status_code == 403
+
+
+def test_export_images_includes_metadata(client, login):
+    db = SessionLocal()
+    db.add(models.Images(image="/srv/images/1.jpg", width=640, height=480, format="JPEG", file_size=1234,
+                         camera_make="Canon", camera_model="EOS R5"))
+    db.commit()
+    db.close()
+
+    response = client.get("/export/images", headers=login("admin@example.com"))
+
+    assert response.status_code == 200
+    row = json.loads(response.text.splitlines()[0])
+    assert row["image"] == "/srv/images/1.jpg"
+    assert (row["width"], row["height"], row["format"], row["file_size"]) == (640, 480, "JPEG", 1234)
+    assert (row["camera_make"], row["camera_model"], row["taken_at"]) == ("Canon", "EOS R5", None)
+    assert row["created_at"]
@@ -0,0 +1,19 @@
+from app.schemas import BULK_LIKE_MAX_ITEMS
+
+
+def test_bulk_like(client, login):
+    headers = login("reader@example.com")
+    client.post("/posts/", json={"title": "Title", "content": "Content", "image": "image.jpg"}, headers=headers)
+
+    response = client.post("/like_post/bulk/", json=[{"post_id": 1, "direction": 1}, {"post_id": 2, "direction": 1}],
+                           headers=headers)
+
+    assert response.status_code == 200
+    assert [item["status"] for item in response.json()] == ["liked", "not_found"]
+
+
+def test_bulk_like_too_many_toggles(client, login):
+    headers = login("reader@example.com")
+    toggles = [{"post_id": post_id, "direction": 1} for post_id in range(1, BULK_LIKE_MAX_ITEMS + 2)]
+
+    assert client.post("/like_post/bulk/", json=toggles, headers=headers).status_code == 422
@@ -0,0 +1,25 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app.database import engine
+from app.metrics import DB_QUERY_DURATION
+
+
+def histogram_sample(suffix):
+    return next(sample.value for metric in DB_QUERY_DURATION.collect() for sample in metric.samples
+                if sample.name.endswith(suffix))
+
+
+def test_failed_queries_leave_no_timing_state(client):
+    with engine.connect() as connection:
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                connection.execute(text("SELECT * FROM missing_table"))
+        count, total = histogram_sample("_count"), histogram_sample("_sum")
+        connection.execute(text("SELECT 1"))
+
+        assert histogram_sample("_count") == count + 1
+        assert 0 <= histogram_sample("_sum") - total < 1
+        # connection info outlives checkouts, so anything left there would pile up
+        assert not connection.info.get("query_start_time")
@@ -0,0 +1,56 @@
+import asyncio
+
+import httpx
+from starlette.responses import JSONResponse
+
+from app.rate_limit import BULK_LIKE_BURST, POLICIES, AdmissionMiddleware, MemoryBucketStore
+from app.token import create_access_token
+
+
+def policy_of(method, path):
+    return next((policy.name for policy in POLICIES if policy.matches(method, path)), None)
+
+
+def test_bulk_policies():
+    assert policy_of("POST", "/users/bulk/") == "bulk"
+    assert policy_of("POST", "/posts/bulk/") == "bulk"
+    assert policy_of("GET", "/export/comments") == "bulk"
+    assert policy_of("POST", "/like_post/bulk/") == "bulk_like"
+
+
+def headers_of(user_id):
+    token = create_access_token(data={"user_id": user_id, "sub": f"user{user_id}@example.com"})
+    return {"Authorization": f"Bearer {token}"}
+
+
+async def slow_endpoint(scope, receive, send):
+    await asyncio.sleep(0.05)
+    await JSONResponse([])(scope, receive, send)
+
+
+def post_all(requests):
+    async def run():
+        transport = httpx.ASGITransport(app=AdmissionMiddleware(slow_endpoint, MemoryBucketStore()))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            responses = await asyncio.gather(*(client.post(path, headers=headers) for path, headers in requests))
+        return [response.status_code for response in responses]
+
+    return asyncio.run(run())
+
+
+def test_concurrent_bulk_likes_of_different_users():
+    assert post_all([("/like_post/bulk/", headers_of(1)), ("/like_post/bulk/", headers_of(2))]) == [200, 200]
+
+
+def test_bulk_likes_are_limited_per_user():
+    requests = [("/like_post/bulk/", headers_of(1))] * (BULK_LIKE_BURST + 1)
+    statuses = post_all(requests + [("/like_post/bulk/", headers_of(2))])
+
+    assert statuses.count(429) == 1
+    assert statuses[-1] == 200
+
+
+def test_concurrent_imports_are_shed():
+    statuses = post_all([("/posts/bulk/", headers_of(1)), ("/users/bulk/", headers_of(2))])
+
+    assert sorted(statuses) == [200, 503]
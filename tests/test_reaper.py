@@ -0,0 +1,56 @@
+import logging
+
+from sqlalchemy import func
+
+from app import models
+from app.database import SessionLocal
+from app.reaper import reap_images
+
+
+def add_images(*paths, deleted=True):
+    db = SessionLocal()
+    db.add_all([models.Images(image=str(path), deleted_at=func.now() if deleted else None) for path in paths])
+    db.commit()
+    db.close()
+
+
+def remaining_images():
+    db = SessionLocal()
+    try:
+        return sorted(path for path, in db.query(models.Images.image))
+    finally:
+        db.close()
+
+
+def test_images_are_kept_without_root(client, tmp_path, caplog):
+    image = tmp_path / "image.png"
+    image.write_bytes(b"image")
+    add_images(image)
+
+    db = SessionLocal()
+    with caplog.at_level(logging.WARNING, logger="app.reaper"):
+        assert reap_images(db, root=None) == 0
+    db.close()
+
+    assert image.exists()
+    assert remaining_images() == [str(image)]
+    assert "IMAGE_ROOT is not set" in caplog.text
+
+
+def test_only_orphaned_files_under_root_are_removed(client, tmp_path):
+    root = tmp_path / "images"
+    root.mkdir()
+    orphan, shared, outside = root / "orphan.png", root / "shared.png", tmp_path / "outside.txt"
+    for path in (orphan, shared, outside):
+        path.write_bytes(b"data")
+    (root / "link.png").symlink_to(outside)
+    add_images(orphan, shared, outside, root / ".." / "outside.txt", root / "link.png")
+    add_images(shared, deleted=False)
+
+    db = SessionLocal()
+    assert reap_images(db, root=str(root)) == 5
+    db.close()
+
+    assert not orphan.exists()
+    assert shared.exists() and outside.exists()
+    assert remaining_images() == [str(shared)]
@@ -0,0 +1,19 @@
+def test_user_posts(client, login):
+    headers = login("author@example.com")
+    client.post("/posts/", json={"title": "Title", "content": "Content", "image": "image.jpg"}, headers=headers)
+
+    posts = client.get("/users/1/posts").json()
+
+    assert [(post["Post"]["title"], post["likes"]) for post in posts] == [("Title", 0)]
+    assert client.get("/users/1/stats").json()["post_count"] == 1
+
+
+def test_user_without_posts(client, login):
+    login("reader@example.com")
+
+    assert client.get("/users/1/posts").json() == []
+
+
+def test_missing_user(client):
+    assert client.get("/users/9/posts").status_code == 404
+    assert client.get("/users/9/stats").status_code == 404